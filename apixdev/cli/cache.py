@@ -0,0 +1,64 @@
+import sys
+
+import click
+
+from apixdev.cli.tools import print_list
+from apixdev.core.cache import GitCache
+from apixdev.core.projects import Projects
+from apixdev.core.tools import format_size
+
+
+@click.command()
+def status():
+    """Show cached repositories and disk space saved"""
+
+    cache = GitCache.from_path()
+    items = cache.status(Projects.from_path())
+
+    print_list(
+        [
+            {
+                "name": item["name"],
+                "size": format_size(item["size"]),
+                "users": item["users"],
+                "saved": format_size(item["saved"]),
+            }
+            for item in items
+        ]
+    )
+
+    total = sum(item["saved"] for item in items)
+    click.echo(f"Total disk space saved: {format_size(total)}")
+
+
+@click.command()
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of repositories fetched in parallel (default from settings)",
+)
+def fetch(jobs):
+    """Fetch all cached repositories"""
+
+    cache = GitCache.from_path()
+    results = cache.fetch(jobs)
+    failures = [res for res in results if not res["success"]]
+
+    click.echo(f"{len(results) - len(failures)}/{len(results)} repositories fetched")
+
+    if failures:
+        for res in failures:
+            click.echo(f"\n{res['mirror']} failed:\n{res['output'].decode('utf8')}")
+        sys.exit(1)
+
+
+@click.command()
+def prune():
+    """Remove cached repositories no longer used by any project"""
+
+    cache = GitCache.from_path()
+    removed = cache.prune(Projects.from_path())
+
+    print_list(removed)
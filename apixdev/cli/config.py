@@ -2,6 +2,7 @@ import click
 
 from apixdev.cli.tools import print_dict
 from apixdev.core.exceptions import CommandNotImplemented
+from apixdev.core.odoo import Odoo
 from apixdev.core.settings import settings
 
 
@@ -27,6 +28,16 @@ def clear():
     raise CommandNotImplemented("clear")
 
 
+@click.command()
+def logout():
+    """Clear cached ApiX session"""
+
+    if Odoo.logout():
+        click.echo("Logged out.")
+    else:
+        click.echo("No active session.")
+
+
 @click.command()
 def edit():
     """
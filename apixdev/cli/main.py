@@ -1,10 +1,6 @@
 import click
 
-import apixdev.cli.config as config_cmd
-import apixdev.cli.images as images_cmd
-import apixdev.cli.project as project_cmd
-import apixdev.cli.projects as projects_cmd
-from apixdev.core.settings import settings
+from apixdev.cli.tools import LazyGroup
 
 # try:
 #     settings.check()
@@ -12,9 +8,14 @@ from apixdev.core.settings import settings
 #     click.echo(error)
 #     sys.exit(1)
 
-if not settings.is_ready:
-    click.echo("Please fill configuration to continue :")
-    settings.set_config()
+
+def check_settings():
+    """Ask for missing configuration, before a command runs."""
+    from apixdev.core.settings import settings  # pylint: disable=C0415
+
+    if not settings.is_ready:
+        click.echo("Please fill configuration to continue :")
+        settings.set_config()
 
 
 @click.group()
@@ -22,57 +23,96 @@ def cli():
     """ApiX command line tool."""
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    before_invoke=check_settings,
+    lazy_subcommands={
+        "new": "apixdev.cli.project.new",
+        "update": "apixdev.cli.project.update",
+        "search": "apixdev.cli.project.search",
+        "delete": "apixdev.cli.project.delete",
+        "merge": "apixdev.cli.project.merge",
+        "pull": "apixdev.cli.project.pull",
+        "run": "apixdev.cli.project.run",
+        "restart": "apixdev.cli.project.restart",
+        "stop": "apixdev.cli.project.stop",
+        "clear": "apixdev.cli.project.clear",
+        "status": "apixdev.cli.project.status",
+        "logs": "apixdev.cli.project.logs",
+        "locate": "apixdev.cli.project.locate",
+        "bash": "apixdev.cli.project.bash",
+        "shell": "apixdev.cli.project.shell",
+        "install-modules": "apixdev.cli.project.install_modules",
+        "update-modules": "apixdev.cli.project.update_modules",
+        "last-backup": "apixdev.cli.project.last_backup",
+        "repo": "apixdev.cli.project.repo",
+        "bake": "apixdev.cli.project.bake",
+        "restore": "apixdev.cli.project.restore",
+        "perf-report": "apixdev.cli.project.perf_report",
+        "modules": "apixdev.cli.project.modules",
+    },
+)
 def project():
     """Manage project"""
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    before_invoke=check_settings,
+    lazy_subcommands={
+        "ls": "apixdev.cli.projects.ls",
+        "stop": "apixdev.cli.projects.stop",
+        "pull": "apixdev.cli.projects.pull",
+        "update": "apixdev.cli.projects.update",
+        "merge": "apixdev.cli.projects.merge",
+        "status": "apixdev.cli.projects.status",
+    },
+)
 def projects():
     """Manage projects"""
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    before_invoke=check_settings,
+    lazy_subcommands={
+        "ls": "apixdev.cli.images.ls",
+    },
+)
 def images():
     """Manage Docker images"""
 
 
-@click.group()
+@click.group(
+    cls=LazyGroup,
+    before_invoke=check_settings,
+    lazy_subcommands={
+        "view": "apixdev.cli.config.view",
+        "clear": "apixdev.cli.config.clear",
+        "set-value": "apixdev.cli.config.set_value",
+        "edit": "apixdev.cli.config.edit",
+        "logout": "apixdev.cli.config.logout",
+    },
+)
 def config():
     """View and edit configuration"""
 
 
-project.add_command(project_cmd.new)
-project.add_command(project_cmd.update)
-project.add_command(project_cmd.search)
-project.add_command(project_cmd.delete)
-project.add_command(project_cmd.merge)
-project.add_command(project_cmd.pull)
-project.add_command(project_cmd.run)
-project.add_command(project_cmd.restart)
-project.add_command(project_cmd.stop)
-project.add_command(project_cmd.clear)
-project.add_command(project_cmd.status)
-project.add_command(project_cmd.logs)
-project.add_command(project_cmd.locate)
-project.add_command(project_cmd.bash)
-project.add_command(project_cmd.shell)
-project.add_command(project_cmd.install_modules)
-project.add_command(project_cmd.update_modules)
-project.add_command(project_cmd.last_backup)
-project.add_command(project_cmd.repo)
-
-projects.add_command(projects_cmd.ls)
-projects.add_command(projects_cmd.stop)
-
-images.add_command(images_cmd.ls)
-
-config.add_command(config_cmd.view)
-config.add_command(config_cmd.clear)
-config.add_command(config_cmd.set_value)
-config.add_command(config_cmd.edit)
+@click.group(
+    cls=LazyGroup,
+    before_invoke=check_settings,
+    lazy_subcommands={
+        "status": "apixdev.cli.cache.status",
+        "fetch": "apixdev.cli.cache.fetch",
+        "prune": "apixdev.cli.cache.prune",
+    },
+)
+def cache():
+    """Manage shared git cache"""
+
 
 cli.add_command(project)
 cli.add_command(projects)
 cli.add_command(images)
 cli.add_command(config)
+cli.add_command(cache)
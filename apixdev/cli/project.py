@@ -1,16 +1,128 @@
+import json
+import re
 import sys
+import time
+from datetime import datetime
 
 import click
 
-from apixdev.cli.tools import abort_if_false, print_dict, print_list
-from apixdev.core.exceptions import DownloadError, NoContainerFound
+from apixdev.cli.tools import (
+    abort_if_false,
+    complete_database_names,
+    complete_module_names,
+    print_dict,
+    print_list,
+    print_table,
+)
+from apixdev.core.backup import Backup
+from apixdev.core.catalog import Catalog
+from apixdev.core.exceptions import (
+    NoContainerFound,
+    RequirementsConflict,
+    RestoreError,
+    StackNotReady,
+)
+from apixdev.core.logs import LogFollower
 from apixdev.core.odoo import Odoo
+from apixdev.core.perf import PerfReport
 from apixdev.core.project import Project
+from apixdev.core.settings import settings, vars
+from apixdev.core.tools import format_size
+
+JOBS_OPTION = click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of repositories aggregated in parallel (default from settings)",
+)
+
+
+FORCE_OPTION = click.option(
+    "--force",
+    "-f",
+    is_flag=True,
+    help="Aggregate all repositories, even unchanged ones",
+)
+
+
+def pull_repositories(project, jobs=None, force=False):
+    """Pull project repositories, echo progress and exit on failures."""
+
+    done = []
+
+    def progress(res):
+        done.append(res)
+        if res["skipped"]:
+            state = "up to date"
+        else:
+            state = "ok" if res["success"] else "failed"
+        click.echo(f"[{len(done)}] {res['name']}: {state}")
+
+    results = project.pull_repositories(jobs, callback=progress, force=force)
+    failures = [res for res in results if not res["success"]]
+
+    skipped = [res for res in results if res["skipped"]]
+
+    click.echo(
+        f"{len(results) - len(failures)}/{len(results)} repositories up to date "
+        f"({len(skipped)} unchanged)"
+    )
+
+    if failures:
+        for res in failures:
+            click.echo(f"\n{res['name']} failed:\n{res['output']}")
+        sys.exit(1)
+
+
+def merge_requirements(project, **kwargs):
+    """Merge project requirements and echo changes."""
+
+    try:
+        changes = project.merge_requirements(**kwargs)
+    except RequirementsConflict as error:
+        click.echo(error)
+        sys.exit(1)
+
+    if not changes["added"] and not changes["removed"]:
+        click.echo("Requirements unchanged")
+        return
+
+    for requirement in changes["added"]:
+        click.echo(f"+ {requirement}")
+    for requirement in changes["removed"]:
+        click.echo(f"- {requirement}")
+
+
+REFRESH_OPTION = click.option(
+    "--refresh",
+    is_flag=True,
+    help="Synchronize local catalog with ApiX first",
+)
+
+
+def find_database(name, refresh=False):
+    """Return database from local catalog, synchronized on miss."""
+
+    catalog = Catalog.from_path()
+
+    if refresh or catalog.is_empty:
+        catalog.sync(Odoo.new(), prune=refresh)
+        return catalog.get(name)
+
+    database = catalog.get(name)
+    if not database:
+        catalog.sync(Odoo.new())
+        database = catalog.get(name)
+
+    return database
 
 
 @click.command()
-@click.argument("name")
+@click.argument("name", shell_complete=complete_database_names)
 @click.option("--local", "-l", is_flag=True, help="Create blank project")
+@JOBS_OPTION
+@REFRESH_OPTION
 def new(name, **kwargs):
     """Create new project from online database.
 
@@ -24,8 +136,7 @@ def new(name, **kwargs):
     project = Project(name)
 
     if not is_local:
-        odoo = Odoo.new()
-        database = odoo.get_databases(name, strict=True, limit=1)
+        database = find_database(name, kwargs.get("refresh"))
 
         if not database:
             click.echo(f"No '{name}' database found.")
@@ -33,20 +144,19 @@ def new(name, **kwargs):
             sys.exit(1)
 
         urls = [
-            ("manifest.yaml", database.manifest_url),
-            ("repositories.yaml", database.repositories_url),
-            ("docker-compose.yaml", database.compose_url),
+            ("manifest.yaml", database["manifest_url"]),
+            ("repositories.yaml", database["repositories_url"]),
+            ("docker-compose.yaml", database["compose_url"]),
         ]
 
-        for filename, url in urls:
-            try:
-                project.download(filename, url)
-            except DownloadError as error:
+        _, errors = project.download_all(urls, force=True)
+        if errors:
+            for error in errors:
                 click.echo(error)
-                sys.exit(1)
+            sys.exit(1)
 
-        project.pull_repositories()
-        project.merge_requirements()
+        pull_repositories(project, kwargs.get("jobs"))
+        merge_requirements(project)
 
 
 @click.command()
@@ -58,7 +168,9 @@ def new(name, **kwargs):
     prompt="Are you sure you want to overwrite project ?",
 )
 @click.argument("name")
-def update(name):
+@JOBS_OPTION
+@FORCE_OPTION
+def update(name, jobs, force):
     """Update the local project based on the manifest.
 
     `NAME` is the name of the local project.
@@ -72,14 +184,36 @@ def update(name):
         click.echo(f"No '{project}' project found locally.")
         sys.exit(1)
 
-    project.load_manifest()
-    project.pull_repositories()
-    project.merge_requirements()
+    _, errors = project.load_manifest(force)
+    if errors:
+        for error in errors:
+            click.echo(error)
+        sys.exit(1)
+
+    pull_repositories(project, jobs, force)
+    merge_requirements(project)
 
 
 @click.command()
 @click.argument("name")
-def merge(name):
+@click.option(
+    "--lock/--no-lock",
+    default=None,
+    help="Pin requirements to exact versions before writing, "
+    "a locked project stays locked until --no-lock",
+)
+@click.option("--index-url", help="Package index used to lock (default from settings)")
+@click.option(
+    "--find-links",
+    "wheel_dir",
+    type=click.Path(exists=True, file_okay=False),
+    help="Local wheels directory used to lock instead of the index",
+)
+@click.option(
+    "--python-version",
+    help="Python version of the Odoo image, to lock (default from settings)",
+)
+def merge(name, **kwargs):
     """Merge requirements from online manifest and local repositories.
 
     `NAME` is the name of the local project.
@@ -91,12 +225,14 @@ def merge(name):
         click.echo(f"No '{project}' project found locally.")
         sys.exit(1)
 
-    project.merge_requirements()
+    merge_requirements(project, **kwargs)
 
 
 @click.command()
 @click.argument("name")
-def pull(name):
+@JOBS_OPTION
+@FORCE_OPTION
+def pull(name, jobs, force):
     """Pull repositories."""
 
     project = Project(name)
@@ -105,20 +241,31 @@ def pull(name):
         click.echo(f"No '{project}' project found locally.")
         sys.exit(1)
 
-    project.pull_repositories()
+    pull_repositories(project, jobs, force)
 
 
 @click.command()
-@click.argument("name")
-def search(name):
+@click.argument("name", shell_complete=complete_database_names)
+@REFRESH_OPTION
+def search(name, refresh):
     """Search for online project.
 
-    `NAME` is the name of the online project.
+    `NAME` is the name of the online project, approximate names are accepted.
+
+    Results come from the local catalog, ApiX is only queried
+    when nothing matches or with `--refresh`.
     """
 
-    odoo = Odoo.new()
-    databases = odoo.get_databases(name, strict=False)
-    results = sorted(databases.mapped("name"))
+    catalog = Catalog.from_path()
+
+    if refresh or catalog.is_empty:
+        catalog.sync(Odoo.new(), prune=refresh)
+        results = catalog.search(name)
+    else:
+        results = catalog.search(name)
+        if not results:
+            catalog.sync(Odoo.new())
+            results = catalog.search(name)
 
     print_list(results)
 
@@ -139,17 +286,59 @@ def delete(name):
     project.delete()
 
 
+def wait_stack(project, stack, timeout, start):
+    """Wait for stack readiness, echo and record phases durations."""
+
+    def progress(res):
+        click.echo(f"{res['phase']}: {res['seconds']:.1f}s")
+
+    try:
+        phases = stack.wait(timeout, project.pg_user, start, callback=progress)
+    except StackNotReady as error:
+        click.echo(error)
+        sys.exit(1)
+
+    click.echo(f"Ready in {phases[-1]['elapsed']:.1f}s")
+
+    history = project.read_state("startup").get("history", [])
+    history.append(
+        {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "phases": {res["phase"]: round(res["elapsed"], 2) for res in phases},
+        }
+    )
+    project.write_state("startup", {"history": history[-vars.STARTUP_HISTORY :]})
+
+
 @click.command()
 @click.option("--detach", "-d", is_flag=True, help="Running on background (detach)")
 @click.option("--reload", "-r", is_flag=True, help="Dev mode (auto reload)")
+@click.option(
+    "--wait",
+    "-w",
+    is_flag=True,
+    help="Run on background and wait until Odoo is serving",
+)
+@click.option(
+    "--timeout",
+    type=click.IntRange(min=1),
+    default=vars.WAIT_TIMEOUT,
+    show_default=True,
+    help="Seconds to wait for readiness",
+)
 @click.argument("name")
 def run(name, **kwargs):
     """Run project.
 
     `NAME` is the name of the local project.
+
+    With `--wait` the command returns once pg accepts connections and
+    Odoo answers on http://localhost:8069, startup phases durations
+    are kept in the project state.
     """
 
-    run_on_background = kwargs.get("detach", False)
+    wait = kwargs.get("wait", False)
+    run_on_background = kwargs.get("detach", False) or wait
     auto_reload = kwargs.get("reload", False)
     project = Project(name)
 
@@ -160,7 +349,11 @@ def run(name, **kwargs):
     stack = project.get_stack()
 
     if run_on_background:
+        start = time.monotonic()
         stack.run(run_on_background, False)
+
+        if wait:
+            wait_stack(project, stack, kwargs.get("timeout"), start)
     else:
         # Run on foreground means auto shutdown stack when user exit container
         stack.run(run_on_background, auto_reload)
@@ -237,15 +430,42 @@ def clear(name):
     stack.clear()
 
 
+LOG_COLORS = ["cyan", "magenta", "yellow", "green", "blue"]
+
+
 @click.command()
 @click.argument("name")
-@click.argument("service")
-def logs(name, service="odoo"):
-    """Show container logs.
+@click.argument("services", nargs=-1)
+@click.option(
+    "--since",
+    help="Only logs since timestamp (2024-01-31T10:00:00) or duration (42m)",
+)
+@click.option(
+    "--tail",
+    "-n",
+    default="100",
+    show_default=True,
+    help="Number of lines to show from the end of logs, or 'all'",
+)
+@click.option(
+    "--follow/--no-follow",
+    default=True,
+    show_default=True,
+    help="Keep streaming new lines",
+)
+@click.option(
+    "--level",
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]),
+    help="Only lines of this level or above (tracebacks included)",
+)
+@click.option("--grep", "-g", "pattern", help="Only lines matching this regex")
+def logs(name, services, **kwargs):
+    """Show containers logs, interleaved by timestamp.
 
     `NAME` is the name of the local project.
 
-    `SERVICE` is the name of one of the stack's services, possible values: odoo, pg or redis.
+    `SERVICES` are the stack's services to show, possible values:
+    odoo, pg or redis (default all).
     """
 
     project = Project(name)
@@ -254,13 +474,135 @@ def logs(name, service="odoo"):
         click.echo(f"No '{project}' project found locally.")
         sys.exit(1)
 
+    if kwargs.get("pattern"):
+        try:
+            re.compile(kwargs["pattern"])
+        except re.error as error:
+            raise click.BadParameter(str(error), param_hint="--grep") from error
+
     stack = project.get_stack()
+    containers = []
+
+    for service in services or vars.DOCKER_SERVICES:
+        try:
+            containers.append(stack.get_container(service))
+        except NoContainerFound as error:
+            if services:
+                click.echo(error)
+                sys.exit(1)
+
+    if not containers:
+        click.echo(f"'{project}' stack is down.")
+        sys.exit(1)
+
+    width = max(len(container.service) for container in containers)
+    prefixes = {
+        container.service: click.style(container.service.ljust(width), fg=color)
+        for container, color in zip(containers, LOG_COLORS)
+    }
+
+    follower = LogFollower(containers, **kwargs)
     try:
-        container = stack.get_container(service)
+        for service, message in follower:
+            click.echo(f"{prefixes[service]} | {message}")
+    except KeyboardInterrupt:
+        pass
+
+    if follower.dropped:
+        click.echo(f"{follower.dropped} line(s) dropped, output too slow.", err=True)
+
+
+PERF_COLUMNS = [
+    "route",
+    "model",
+    "count",
+    "p50",
+    "p95",
+    "p99",
+    "sql_p95",
+    "queries_avg",
+    "queries_max",
+]
+
+
+@click.command()
+@click.argument("name")
+@click.option(
+    "--since",
+    help="Only requests since timestamp (2024-01-31T10:00:00) or duration (42m)",
+)
+@click.option(
+    "--follow",
+    "-f",
+    is_flag=True,
+    help="Collect new requests until interrupted (Ctrl+C)",
+)
+@click.option(
+    "--sort",
+    type=click.Choice(["p50", "p95", "p99", "sql_p95", "queries_avg", "count"]),
+    default="p95",
+    show_default=True,
+)
+@click.option("--limit", type=click.IntRange(min=1), help="Show only the N first rows")
+@click.option(
+    "--min-count",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Hide routes with fewer requests",
+)
+@click.option("--json", "as_json", is_flag=True, help="Print report as JSON")
+def perf_report(name, **kwargs):
+    """Report request latency percentiles from Odoo logs.
+
+    `NAME` is the name of the local project, its stack must be running.
+
+    Times are in milliseconds, from werkzeug log lines (query count,
+    SQL time and remaining time) grouped by route and model.
+    """
+
+    project = Project(name)
+
+    if not project.is_ready:
+        click.echo(f"No '{project}' project found locally.")
+        sys.exit(1)
+
+    stack = project.get_stack()
+    try:
+        container = stack.get_container("odoo")
     except NoContainerFound as error:
         click.echo(error)
         sys.exit(1)
-    container.logs()
+
+    report = PerfReport()
+    follower = LogFollower(
+        [container],
+        since=kwargs.get("since"),
+        tail="all",
+        follow=kwargs.get("follow"),
+        pattern=vars.PERF_LOG_PATTERN,
+        # Whole history is replayed, the report must see every request
+        lossless=True,
+    )
+
+    try:
+        for _, message in follower:
+            report.add(message)
+    except KeyboardInterrupt:
+        pass
+
+    if follower.dropped:
+        click.echo(f"{follower.dropped} line(s) dropped, output too slow.", err=True)
+
+    rows = report.get_rows(kwargs.get("sort"), kwargs.get("min_count"))
+    rows = rows[: kwargs.get("limit")]
+
+    if kwargs.get("as_json"):
+        click.echo(json.dumps(rows, indent=2))
+        return
+
+    click.echo(f"{report.count} request(s) analyzed")
+    print_table(rows, PERF_COLUMNS)
 
 
 @click.command()
@@ -308,11 +650,84 @@ def shell(name, database):
     container.shell(database)
 
 
+def validate_modules(project, stack, modules, check=True):
+    """Return comma separated modules, exit on unknown modules.
+
+    Names missing from repositories are looked up in the container addons
+    paths. When the Odoo container is down or its modules can not be
+    listed, unknown names only give a warning.
+    """
+
+    names = [name.strip() for name in modules.split(",") if name.strip()]
+    if not check:
+        return ",".join(names)
+
+    index = project.get_module_index()
+    names_to_check = [name for name in names if name != "all"]
+    unknown = index.validate(names_to_check)
+
+    if unknown:
+        try:
+            available = stack.get_odoo_container().get_modules()
+        except NoContainerFound:
+            available = None
+        if available is None:
+            for name, matches in unknown.items():
+                hint = f", did you mean {', '.join(matches)} ?" if matches else "."
+                click.echo(f"Warning: '{name}' not found in repositories{hint}")
+            return ",".join(names)
+
+        unknown = index.validate(list(unknown), known=available)
+
+    for name, matches in unknown.items():
+        hint = f", did you mean {', '.join(matches)} ?" if matches else "."
+        click.echo(f"Unknown module '{name}'{hint}")
+    if unknown:
+        sys.exit(1)
+
+    return ",".join(names)
+
+
+NO_CHECK_OPTION = click.option(
+    "--no-check", is_flag=True, help="Do not check modules exist before running Odoo"
+)
+
+
+@click.command()
+@click.argument("name")
+@click.argument("query", default="")
+@click.option("--limit", type=click.IntRange(min=1), help="Show only the N first rows")
+@click.option("--json", "as_json", is_flag=True, help="Print modules as JSON")
+def modules(name, query, limit, as_json):
+    """Search Odoo modules available in project repositories.
+
+    `NAME` is the name of the local project.
+
+    `QUERY` filters on module name and summary (default all).
+    """
+
+    project = Project(name)
+
+    if not project.is_ready:
+        click.echo(f"No '{project}' project found locally.")
+        sys.exit(1)
+
+    results = project.get_module_index().search(query, limit)
+
+    if as_json:
+        click.echo(json.dumps(results, indent=2))
+        return
+
+    click.echo(f"{len(results)} module(s) found")
+    print_table(results, ["name", "version", "repository", "summary"])
+
+
 @click.command()
 @click.argument("name")
 @click.argument("database")
-@click.argument("modules")
-def install_modules(name, database, modules):
+@click.argument("modules", shell_complete=complete_module_names)
+@NO_CHECK_OPTION
+def install_modules(name, database, modules, no_check):  # pylint: disable=W0621
     """Install modules on database.
 
     `NAME` is the name of the local project.
@@ -329,6 +744,7 @@ def install_modules(name, database, modules):
         sys.exit(1)
 
     stack = project.get_stack()
+    modules = validate_modules(project, stack, modules, check=not no_check)
     container = stack.get_odoo_container()
     container.install_modules(database, modules, install=True)
 
@@ -336,8 +752,20 @@ def install_modules(name, database, modules):
 @click.command()
 @click.argument("name")
 @click.argument("database")
-@click.argument("modules")
-def update_modules(name, database, modules):
+@click.argument("modules", required=False, shell_complete=complete_module_names)
+@click.option(
+    "--changed",
+    is_flag=True,
+    help="Update modules changed since the last update, and their dependents",
+)
+@click.option(
+    "--mark-current",
+    is_flag=True,
+    help="Record repositories heads as up to date for --changed, Odoo is not run",
+)
+@click.option("--dry-run", is_flag=True, help="Only show modules to update and why")
+@NO_CHECK_OPTION
+def update_modules(name, database, modules, **kwargs):  # pylint: disable=W0621
     """Update modules on database.
 
     `NAME` is the name of the local project.
@@ -345,8 +773,18 @@ def update_modules(name, database, modules):
     `DATABASE` is the name of Odoo database.
 
     `MODULES` is the list of modules to update, comma separated.
+
+    With `--changed`, modules are computed from repositories changes since
+    the last `--changed` or `all` update of `DATABASE`, or since
+    `--mark-current` for a database already up to date.
     """
 
+    changed = kwargs.get("changed")
+    mark_current = kwargs.get("mark_current")
+
+    if [bool(modules), changed, mark_current].count(True) != 1:
+        raise click.UsageError("Pass either MODULES, --changed or --mark-current.")
+
     project = Project(name)
 
     if not project.is_ready:
@@ -354,8 +792,50 @@ def update_modules(name, database, modules):
         sys.exit(1)
 
     stack = project.get_stack()
+
+    if mark_current:
+        project.record_module_update(database, project.get_repositories_heads())
+        click.echo(f"'{database}' marked up to date with current repositories.")
+        return
+
+    if changed:
+        reasons, heads = project.get_changed_modules(database)
+
+        if reasons is None:
+            click.echo(
+                f"No update recorded for '{database}', "
+                f"run `update-modules {name} {database} all` once first, "
+                "or --mark-current if it is already up to date."
+            )
+            sys.exit(1)
+
+        if reasons:
+            rows = [{"module": key, "reason": val} for key, val in reasons.items()]
+            print_table(rows, ["module", "reason"])
+        modules = ",".join(sorted(reasons))
+    else:
+        modules = validate_modules(
+            project, stack, modules, check=not kwargs.get("no_check")
+        )
+        heads = project.get_repositories_heads() if modules == "all" else None
+
+    if kwargs.get("dry_run"):
+        click.echo(f"Would update: {modules or 'nothing'}")
+        return
+
+    if not modules:
+        click.echo("Nothing to update.")
+        project.record_module_update(database, heads)
+        return
+
     container = stack.get_odoo_container()
-    container.install_modules(database, modules, install=False)
+
+    if not container.install_modules(database, modules, install=False):
+        click.echo(f"Unable to update modules on '{database}'.")
+        sys.exit(1)
+
+    if heads is not None:
+        project.record_module_update(database, heads)
 
 
 @click.command()
@@ -382,6 +862,33 @@ def status(name):
     print_list(containers)
 
 
+@click.command()
+@click.argument("name")
+@click.option("--force", "-f", is_flag=True, help="Build even if image is up to date")
+def bake(name, force):
+    """Build project image with requirements preinstalled.
+
+    `NAME` is the name of the local project.
+
+    The project's docker-compose.yaml is updated to use the new image,
+    run `merge` first to bake the latest requirements.
+    """
+
+    project = Project(name)
+
+    if not project.is_ready:
+        click.echo(f"No '{project}' project found locally.")
+        sys.exit(1)
+
+    tag, built = project.bake(force)
+
+    if not tag:
+        click.echo(f"Unable to build '{project}' image.")
+        sys.exit(1)
+
+    click.echo(f"{tag} built." if built else f"{tag} already up to date.")
+
+
 @click.command()
 @click.argument("name")
 def locate(name):
@@ -424,6 +931,85 @@ def last_backup(name):
         click.launch(url)
 
 
+def print_phase(stats):
+    """Echo phase duration and throughput."""
+
+    seconds = stats["seconds"]
+    throughput = stats["bytes"] / seconds if seconds else 0
+
+    click.echo(
+        f"{stats['phase']}: {format_size(stats['bytes'])} in {seconds:.1f}s "
+        f"({format_size(throughput)}/s)"
+    )
+
+
+@click.command()
+@click.argument("name")
+@click.argument("database")
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Parallel pg_restore jobs for custom format dumps (default from settings)",
+)
+@click.option("--keep", is_flag=True, help="Save downloaded backup file locally")
+@click.option("--replace", is_flag=True, help="Drop DATABASE first if it exists")
+def restore(name, database, jobs, keep, replace):
+    """Restore last online backup into local stack.
+
+    `NAME` is the name of the local project, its stack must be running.
+
+    `DATABASE` is the name of the local database to create.
+
+    The backup is restored while it is downloaded. With `--keep` it is
+    also saved locally, an interrupted download is resumed on next call.
+    """
+
+    project = Project(name)
+
+    if not project.is_ready:
+        click.echo(f"No '{project}' project found locally.")
+        sys.exit(1)
+
+    stack = project.get_stack()
+    try:
+        pg_container = stack.get_container("pg")
+        odoo_container = stack.get_odoo_container()
+    except NoContainerFound as error:
+        click.echo(error)
+        sys.exit(1)
+
+    odoo = Odoo.new()
+    url = odoo.get_last_backup_url(project.uuid)
+
+    if not url:
+        click.echo(f"No backup found for '{project}'.")
+        sys.exit(1)
+
+    backup = Backup(url, project.backup_file)
+
+    try:
+        stats = backup.restore(
+            pg_container,
+            odoo_container,
+            database,
+            jobs=jobs or settings.jobs,
+            pg_user=project.pg_user,
+            keep=keep,
+            replace=replace,
+        )
+    except RestoreError as error:
+        click.echo(error)
+        sys.exit(1)
+
+    for item in stats:
+        print_phase(item)
+
+    if not keep:
+        backup.remove()
+
+
 @click.command()
 @click.argument("name")
 def repo(name):
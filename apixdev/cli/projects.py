@@ -1,16 +1,116 @@
+import sys
+
 import click
 
-from apixdev.cli.tools import abort_if_false, print_list
-from apixdev.core.exceptions import CommandNotImplemented
+from apixdev.cli.tools import abort_if_false, print_list, print_table
 from apixdev.core.projects import Projects
+from apixdev.core.settings import settings
+
+PATTERNS_ARGUMENT = click.argument("patterns", nargs=-1)
+
+JOBS_OPTION = click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of projects processed in parallel (default from settings)",
+)
+
+
+def run_operation(operation, patterns, jobs=None, **kwargs):
+    """Run operation on selected projects, echo progress and results table."""
+
+    projects = Projects.from_path(patterns=patterns)
+
+    if not projects:
+        click.echo("No project found locally.")
+        sys.exit(1)
+
+    done = []
+
+    def progress(res):
+        done.append(res)
+        state = "ok" if res["success"] else "failed"
+        click.echo(f"[{len(done)}/{len(projects)}] {res['name']}: {state}")
+
+    results = Projects.run(projects, operation, jobs, callback=progress, **kwargs)
+
+    for res in results:
+        res["result"] = "ok" if res["success"] else "failed"
+        res["time"] = f"{res['seconds']:.1f}s"
+
+    click.echo()
+    print_table(results, ["name", "result", "time", "message"])
+
+    if not all(res["success"] for res in results):
+        sys.exit(1)
+
+
+SORT_KEYS = {
+    "name": lambda entry: entry["name"],
+    "version": lambda entry: (str(entry["major_version"]), entry["name"]),
+    "modified": lambda entry: -entry["mtime"],
+}
+
+
+@click.command()
+@PATTERNS_ARGUMENT
+@click.option("--version", "major_version", help="Only projects of this Odoo version")
+@click.option("--running", is_flag=True, help="Only projects with running containers")
+@click.option(
+    "--sort",
+    type=click.Choice(list(SORT_KEYS)),
+    default="name",
+    show_default=True,
+    help="Sort order, modified lists recently updated manifests first",
+)
+def ls(patterns, major_version, running, sort):  # pylint: disable=C0103
+    """List local projects
+
+    `PATTERNS` are optional glob patterns on project names.
+    """
+
+    entries = Projects(settings.workdir).get_entries(patterns, major_version, running)
+    entries.sort(key=SORT_KEYS[sort])
+
+    print_list([f"{entry['name']} ({entry['major_version']})" for entry in entries])
+
+
+@click.command()
+@click.option(
+    "--yes",
+    is_flag=True,
+    callback=abort_if_false,
+    expose_value=False,
+    prompt="Are you sure you want to stop all selected projects?",
+)
+@PATTERNS_ARGUMENT
+@JOBS_OPTION
+def stop(patterns, jobs):
+    """Stop all projects
+
+    `PATTERNS` are optional glob patterns on project names.
+    """
+
+    run_operation("stop", patterns, jobs)
 
 
 @click.command()
-def ls():  # pylint: disable=C0103
-    """List local projects"""
+@PATTERNS_ARGUMENT
+@JOBS_OPTION
+@click.option(
+    "--force",
+    "-f",
+    is_flag=True,
+    help="Aggregate all repositories, even unchanged ones",
+)
+def pull(patterns, jobs, force):
+    """Pull repositories of all projects
 
-    projects = Projects.from_path()
-    print_list(projects)
+    `PATTERNS` are optional glob patterns on project names.
+    """
+
+    run_operation("pull", patterns, jobs, force=force)
 
 
 @click.command()
@@ -19,8 +119,44 @@ def ls():  # pylint: disable=C0103
     is_flag=True,
     callback=abort_if_false,
     expose_value=False,
-    prompt="Are you sure you want to stop all projects?",
+    prompt="Are you sure you want to overwrite all selected projects?",
 )
-def stop():
-    """Stop all projects"""
-    raise CommandNotImplemented("stop")
+@PATTERNS_ARGUMENT
+@JOBS_OPTION
+@click.option(
+    "--force",
+    "-f",
+    is_flag=True,
+    help="Download manifests and aggregate repositories, even unchanged ones",
+)
+def update(patterns, jobs, force):
+    """Update all projects based on their manifest
+
+    `PATTERNS` are optional glob patterns on project names.
+    """
+
+    run_operation("update", patterns, jobs, force=force)
+
+
+@click.command()
+@PATTERNS_ARGUMENT
+@JOBS_OPTION
+def merge(patterns, jobs):
+    """Merge requirements of all projects
+
+    `PATTERNS` are optional glob patterns on project names.
+    """
+
+    run_operation("merge", patterns, jobs)
+
+
+@click.command()
+@PATTERNS_ARGUMENT
+@JOBS_OPTION
+def status(patterns, jobs):
+    """Show stack state of all projects
+
+    `PATTERNS` are optional glob patterns on project names.
+    """
+
+    run_operation("status", patterns, jobs)
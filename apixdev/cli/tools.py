@@ -1,8 +1,60 @@
+import copy
+import functools
+import importlib
+
 import click
 
 from apixdev.core.tools import dict_to_string
 
 
+class LazyGroup(click.Group):
+    """Click group resolving its subcommands on demand.
+
+    `lazy_subcommands` maps a command name to a "module.attribute" path,
+    the module is only imported when the command is actually invoked.
+    `before_invoke` is called right before a subcommand callback, once its
+    arguments are parsed: never for help nor completion.
+    """
+
+    def __init__(self, *args, lazy_subcommands=None, before_invoke=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy_subcommands = lazy_subcommands or {}
+        self.before_invoke = before_invoke
+
+    def list_commands(self, ctx):
+        base = super().list_commands(ctx)
+        return sorted(base + list(self.lazy_subcommands.keys()))
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name in self.lazy_subcommands:
+            return self._lazy_load(cmd_name)
+        return super().get_command(ctx, cmd_name)
+
+    def _lazy_load(self, cmd_name):
+        import_path = self.lazy_subcommands[cmd_name]
+        modname, cmd_object_name = import_path.rsplit(".", 1)
+        module = importlib.import_module(modname)
+        cmd_object = getattr(module, cmd_object_name)
+
+        if not isinstance(cmd_object, click.Command):
+            raise ValueError(
+                f"Lazy loading of {import_path} did not return a command object"
+            )
+        if not self.before_invoke or not cmd_object.callback:
+            return cmd_object
+
+        # Copy, the module command is left untouched
+        command = copy.copy(cmd_object)
+
+        @functools.wraps(cmd_object.callback)
+        def callback(*args, **kwargs):
+            self.before_invoke()
+            return cmd_object.callback(*args, **kwargs)
+
+        command.callback = callback
+        return command
+
+
 def print_list(items):
     """Echo list with click."""
 
@@ -24,6 +76,47 @@ def print_dict(vals, index=True):
             click.echo(f"{key}: {vals[key]}")
 
 
+def print_table(rows, columns):
+    """Echo list of dicts as a table, `columns` are the keys to show."""
+
+    cells = [[str(row.get(column, "")) for column in columns] for row in rows]
+    widths = [
+        max([len(column)] + [len(line[i]) for line in cells])
+        for i, column in enumerate(columns)
+    ]
+
+    for line in [[column.upper() for column in columns]] + cells:
+        padded = [cell.ljust(widths[i]) for i, cell in enumerate(line)]
+        click.echo("  ".join(padded).rstrip())
+
+
+def complete_database_names(ctx, param, incomplete):  # pylint: disable=W0613
+    """Shell completion of ApiX database names from local catalog."""
+    from apixdev.core.catalog import Catalog  # pylint: disable=C0415
+
+    names = Catalog.from_path().names()
+    return sorted(name for name in names if name.startswith(incomplete))
+
+
+def complete_module_names(ctx, param, incomplete):  # pylint: disable=W0613
+    """Shell completion of the last module of a comma separated list."""
+    from apixdev.core.project import Project  # pylint: disable=C0415
+
+    name = ctx.params.get("name")
+    if not name:
+        return []
+
+    project = Project(name)
+    if not project.is_ready:
+        return []
+
+    head, _, last = incomplete.rpartition(",")
+    head = f"{head}," if head else ""
+    names = project.get_module_index().modules
+
+    return sorted(f"{head}{name}" for name in names if name.startswith(last))
+
+
 def abort_if_false(ctx, _, value):
     """Confirm: Abort if false."""
 
@@ -0,0 +1,545 @@
+import io
+import json
+import logging
+import os
+import shutil
+import struct
+import tarfile
+import time
+import zlib
+
+from apixdev.core.exceptions import RestoreError
+from apixdev.core.settings import vars
+from apixdev.core.tools import get_http_session
+
+_logger = logging.getLogger(__name__)
+
+ZIP_LOCAL_SIGNATURE = b"PK\x03\x04"
+ZIP_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+ZIP_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+ZIP64_EXTRA_ID = 0x0001
+ZIP_FLAG_ENCRYPTED = 0x1
+ZIP_FLAG_DESCRIPTOR = 0x8
+ZIP_FLAG_UTF8 = 0x800
+ZIP_STORED = 0
+ZIP_DEFLATED = 8
+
+
+class BackupStream:
+    """Backup content read once from start to end, while it is downloaded.
+
+    A complete or partial local copy of the same url is read first, the
+    download resumes where it ends. With `save`, downloaded bytes are
+    appended to the partial file, renamed to the backup file once complete.
+    """
+
+    def __init__(self, backup, save=False):
+        self.backup = backup
+        self.save = save
+        self.received = 0
+        self.position = 0
+
+        self._buffer = bytearray()
+        self._chunks = None
+        self._start = None
+        self._end = None
+
+    def __enter__(self):
+        self._start = time.monotonic()
+        self._chunks = self._iter_chunks()
+        return self
+
+    def __exit__(self, *args):
+        self._chunks.close()
+        self._end = self._end or time.monotonic()
+
+    @property
+    def stats(self):
+        """Download phase stats."""
+        seconds = (self._end or time.monotonic()) - self._start
+        return {"phase": "download", "bytes": self.received, "seconds": seconds}
+
+    @property
+    def is_local(self):
+        """Check if the backup is entirely available locally."""
+        return os.path.exists(self.backup.filepath)
+
+    def _iter_file(self, filepath):
+        with open(filepath, "rb") as file:
+            while True:
+                chunk = file.read(vars.DOWNLOAD_CHUNK_SIZE)
+                if not chunk:
+                    return
+                yield chunk
+
+    def _iter_chunks(self):
+        backup = self.backup
+        info = backup.read_info()
+
+        if info.get("url") != backup.url:
+            backup.remove()
+        if self.is_local:
+            yield from self._iter_file(backup.filepath)
+            return
+
+        offset = 0
+        headers = {}
+        if os.path.exists(backup.part_filepath) and info.get("etag"):
+            offset = os.path.getsize(backup.part_filepath)
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = info["etag"]
+
+        with get_http_session().get(
+            backup.url, headers=headers, stream=True, timeout=vars.DEFAULT_TIMEOUT
+        ) as response:
+            # Range not satisfiable: partial file is already complete
+            if response.status_code == 416:
+                yield from self._iter_file(backup.part_filepath)
+                os.replace(backup.part_filepath, backup.filepath)
+                return
+
+            response.raise_for_status()
+            if response.status_code != 206:
+                _logger.debug("Server ignored range, restart download")
+                offset = 0
+            if offset:
+                yield from self._iter_file(backup.part_filepath)
+
+            file = None
+            if self.save:
+                os.makedirs(os.path.dirname(backup.filepath), exist_ok=True)
+                backup.write_info(response.headers.get("ETag"))
+                file = open(  # pylint: disable=R1732
+                    backup.part_filepath, "ab" if offset else "wb"
+                )
+
+            try:
+                for chunk in response.iter_content(vars.DOWNLOAD_CHUNK_SIZE):
+                    if file:
+                        file.write(chunk)
+                    self.received += len(chunk)
+                    yield chunk
+            finally:
+                if file:
+                    file.close()
+
+        if self.save:
+            os.replace(backup.part_filepath, backup.filepath)
+
+    def _fill(self, size):
+        from requests.exceptions import RequestException  # pylint: disable=C0415
+
+        try:
+            while size < 0 or len(self._buffer) < size:
+                chunk = next(self._chunks, None)
+                if chunk is None:
+                    self._end = self._end or time.monotonic()
+                    return
+                self._buffer += chunk
+        except RequestException as error:
+            raise RestoreError(f"Backup download failed: {error}") from error
+
+    def peek(self, size):
+        """Return next `size` bytes without consuming them."""
+        self._fill(size)
+        return bytes(self._buffer[:size])
+
+    def read(self, size=-1):
+        """Return up to `size` bytes, less only at end of backup."""
+        self._fill(size)
+        if size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        self.position += len(data)
+        return data
+
+    def unread(self, data):
+        """Push back `data`, returned again by next read."""
+        self._buffer[:0] = data
+        self.position -= len(data)
+
+    def read_exactly(self, size):
+        """Return `size` bytes, raise RestoreError at end of backup."""
+        data = self.read(size)
+        if len(data) != size:
+            raise RestoreError("Backup is truncated.")
+        return data
+
+
+class ZipEntry:
+    """File object on the data of a zip entry read sequentially.
+
+    `read(size)` returns `size` bytes until the end of the entry, the
+    CRC is checked once everything was read.
+    """
+
+    def __init__(self, stream, header):
+        self.stream = stream
+        self.name = header["name"]
+        self.method = header["method"]
+        self.size = header["size"]
+        self.date_time = header["date_time"]
+        self.position = 0
+
+        self._compressed_left = header["compressed_size"]
+        self._descriptor = header["descriptor"]
+        self._zip64 = header["zip64"]
+        self._crc = header["crc"]
+        self._computed_crc = 0
+        self._decompressor = zlib.decompressobj(-15)
+        self._output = bytearray()
+        self._eof = False
+
+    def _read_chunk(self):
+        if self.method == ZIP_STORED:
+            size = min(self._compressed_left, vars.DOWNLOAD_CHUNK_SIZE)
+            data = self.stream.read_exactly(size)
+            self._compressed_left -= size
+            self._eof = not self._compressed_left
+            return data
+
+        # Deflate streams end by themselves, sizes may only follow the data
+        size = vars.DOWNLOAD_CHUNK_SIZE
+        if not self._descriptor:
+            size = min(self._compressed_left, size)
+        data = self.stream.read(size)
+        if not data:
+            raise RestoreError("Backup is truncated.")
+        self._compressed_left -= len(data)
+
+        output = self._decompressor.decompress(data)
+        if self._decompressor.eof:
+            self.stream.unread(self._decompressor.unused_data)
+            self._eof = True
+        elif not self._descriptor and not self._compressed_left:
+            raise RestoreError(f"Invalid compressed data in {self.name}.")
+        return output
+
+    def _finish(self):
+        if self._descriptor:
+            data = self.stream.read_exactly(4)
+            if data == ZIP_DESCRIPTOR_SIGNATURE:
+                data = self.stream.read_exactly(4)
+            self._crc = struct.unpack("<I", data)[0]
+            self.stream.read_exactly(16 if self._zip64 else 8)
+
+        if self._computed_crc != self._crc:
+            raise RestoreError(f"Bad CRC for {self.name}, backup is corrupted.")
+
+    def read(self, size=-1):
+        """Return `size` bytes of entry content, less only at its end."""
+
+        while not self._eof and (size < 0 or len(self._output) < size):
+            data = self._read_chunk()
+            self._computed_crc = zlib.crc32(data, self._computed_crc)
+            self._output += data
+            if self._eof:
+                self._finish()
+
+        if size < 0:
+            size = len(self._output)
+        data = bytes(self._output[:size])
+        del self._output[:size]
+        self.position += len(data)
+        return data
+
+    def skip(self):
+        """Read remaining content."""
+        while self.read(vars.DOWNLOAD_CHUNK_SIZE):
+            pass
+
+
+def parse_dos_date_time(dos_date, dos_time):
+    """Return date_time tuple of zip entry date and time fields."""
+    return (
+        (dos_date >> 9) + 1980,
+        (dos_date >> 5) & 0xF,
+        dos_date & 0x1F,
+        dos_time >> 11,
+        (dos_time >> 5) & 0x3F,
+        (dos_time & 0x1F) * 2,
+    )
+
+
+def iter_zip_entries(stream):
+    """Yield ZipEntry objects of a zip archive read from start to end.
+
+    Each entry must be read before the next one is yielded, unread
+    content is skipped. Raise RestoreError on unsupported entries.
+    """
+
+    while stream.peek(4) == ZIP_LOCAL_SIGNATURE:
+        fields = ZIP_LOCAL_HEADER.unpack(stream.read_exactly(ZIP_LOCAL_HEADER.size))
+        _, _, flags, method, dos_time, dos_date, crc, compressed_size, size = fields[:9]
+        name = stream.read_exactly(fields[9])
+        extra = stream.read_exactly(fields[10])
+
+        name = name.decode("utf8" if flags & ZIP_FLAG_UTF8 else "cp437")
+        zip64 = False
+
+        # Zip64 extra field holds sizes that do not fit in 32 bits
+        while len(extra) >= 4:
+            header_id, length = struct.unpack("<HH", extra[:4])
+            if header_id == ZIP64_EXTRA_ID:
+                zip64 = True
+                count = length // 8
+                values = list(struct.unpack(f"<{count}Q", extra[4 : 4 + count * 8]))
+                if size == 0xFFFFFFFF and values:
+                    size = values.pop(0)
+                if compressed_size == 0xFFFFFFFF and values:
+                    compressed_size = values.pop(0)
+            extra = extra[4 + length :]
+
+        descriptor = bool(flags & ZIP_FLAG_DESCRIPTOR)
+        if flags & ZIP_FLAG_ENCRYPTED or method not in (ZIP_STORED, ZIP_DEFLATED):
+            raise RestoreError(f"Unsupported zip entry {name}.")
+        if descriptor and method == ZIP_STORED:
+            raise RestoreError(f"Unsupported zip entry {name}, size unknown.")
+
+        entry = ZipEntry(
+            stream,
+            {
+                "name": name,
+                "method": method,
+                "size": None if descriptor else size,
+                "compressed_size": compressed_size,
+                "crc": crc,
+                "descriptor": descriptor,
+                "zip64": zip64,
+                "date_time": parse_dos_date_time(dos_date, dos_time),
+            },
+        )
+        yield entry
+        entry.skip()
+
+
+class Backup:
+    """Odoo backup streamed from its url into a stack.
+
+    The backup is restored while it is downloaded, it is only written
+    locally when kept.
+    """
+
+    def __init__(self, url, filepath):
+        self.url = url
+        self.filepath = filepath
+
+    @property
+    def part_filepath(self):
+        """Filepath of the partial download."""
+        return f"{self.filepath}.part"
+
+    @property
+    def info_filepath(self):
+        """Filepath of the url and ETag the local files were downloaded from."""
+        return f"{self.filepath}.json"
+
+    def read_info(self):
+        """Return url and ETag the local files were downloaded from."""
+        try:
+            with open(self.info_filepath, encoding="utf8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def write_info(self, etag):
+        """Write url and ETag of the local files."""
+        with open(self.info_filepath, "w", encoding="utf8") as file:
+            json.dump({"url": self.url, "etag": etag}, file)
+
+    def remove(self):
+        """Remove downloaded, partial and info files."""
+
+        for filepath in [self.filepath, self.part_filepath, self.info_filepath]:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    @staticmethod
+    def _database_exists(container, database, pg_user):
+        output = container.get_output(
+            ["psql", "-U", pg_user, "-d", "postgres", "-lqtA"]
+        )
+        if output is None:
+            raise RestoreError("Unable to list databases.")
+        return database in (line.split("|")[0] for line in output.splitlines())
+
+    @staticmethod
+    def _drop_database(pg_container, odoo_container, database, pg_user):
+        """Drop database and its filestore, return True on success."""
+
+        filestore = os.path.join(vars.ODOO_DATA_DIR, "filestore", database)
+        dropped = pg_container.execute(
+            ["dropdb", "-U", pg_user, "--if-exists", database]
+        )
+        return odoo_container.execute(["rm", "-rf", filestore]) and dropped
+
+    def restore(self, pg_container, odoo_container, database, **kwargs):
+        """Restore backup into `database` while downloading it.
+
+        Odoo zip backups are read as they arrive, dump.sql is streamed to
+        psql and the filestore unpacked in the odoo container. Custom
+        format dumps are streamed to pg_restore, or with several `jobs`
+        copied once into the pg container for parallel workers.
+        With `keep` the backup is saved locally and a later call resumes
+        its download. An existing database is only replaced with `replace`,
+        the database is dropped again if the restore fails.
+        Return phases stats, download first.
+        """
+
+        pg_user = kwargs.get("pg_user") or vars.DEFAULT_PG_USER
+        containers = (pg_container, odoo_container)
+
+        if self._database_exists(pg_container, database, pg_user):
+            if not kwargs.get("replace"):
+                raise RestoreError(
+                    f"Database {database} already exists, use --replace to drop it."
+                )
+            if not self._drop_database(*containers, database, pg_user):
+                raise RestoreError(f"Unable to drop database {database}.")
+
+        if not pg_container.execute(["createdb", "-U", pg_user, database]):
+            raise RestoreError(f"Unable to create database {database}.")
+
+        try:
+            with BackupStream(self, save=kwargs.get("keep")) as stream:
+                stats = self._restore(stream, *containers, database, pg_user, kwargs)
+                # Read what is left, so a kept backup is complete
+                while kwargs.get("keep") and stream.read(vars.DOWNLOAD_CHUNK_SIZE):
+                    pass
+            return [stream.stats] + stats
+        except BaseException as error:
+            # Keep no half restored database, the restore can be run again
+            _logger.debug("Restore failed, drop %s", database)
+            self._drop_database(*containers, database, pg_user)
+            if isinstance(error, (RestoreError, KeyboardInterrupt)):
+                raise
+            raise RestoreError(f"Backup restore failed: {error}") from error
+
+    def _restore(self, stream, pg_container, odoo_container, database, pg_user, opts):
+        header = stream.peek(max(len(vars.PG_DUMP_MAGIC), len(ZIP_LOCAL_SIGNATURE)))
+
+        if header.startswith(vars.PG_DUMP_MAGIC):
+            return [self._restore_dump(stream, pg_container, database, pg_user, opts)]
+        if header.startswith(ZIP_LOCAL_SIGNATURE):
+            return self._restore_zip(
+                stream, pg_container, odoo_container, database, pg_user
+            )
+
+        raise RestoreError("Unknown backup format.")
+
+    @staticmethod
+    def _feed(process, fileobj):
+        """Copy `fileobj` to process stdin, return its exit code."""
+
+        try:
+            with process.stdin:
+                shutil.copyfileobj(fileobj, process.stdin, vars.DOWNLOAD_CHUNK_SIZE)
+        except BrokenPipeError:
+            # Process stopped on first error, reported by its exit code
+            pass
+        return process.wait()
+
+    def _restore_zip(self, stream, pg_container, odoo_container, database, pg_user):
+        phases = {
+            name: {"phase": name, "bytes": 0, "seconds": 0.0}
+            for name in ["database", "filestore"]
+        }
+        restored = False
+
+        psql = pg_container.popen(
+            ["psql", "-q", "-v", "ON_ERROR_STOP=1", "-U", pg_user, "-d", database]
+        )
+        tar_process = odoo_container.popen(["tar", "-x", "-C", vars.ODOO_DATA_DIR])
+
+        try:
+            with tarfile.open(fileobj=tar_process.stdin, mode="w|") as tar:
+                for entry in iter_zip_entries(stream):
+                    start = time.monotonic()
+
+                    if entry.name == "dump.sql":
+                        phase = phases["database"]
+                        if self._feed(psql, entry):
+                            raise RestoreError("Database restore failed.")
+                        restored = True
+                    elif entry.name.startswith("filestore/"):
+                        if entry.name.endswith("/"):
+                            continue
+                        phase = phases["filestore"]
+                        self._add_file(tar, entry, database)
+                    else:
+                        continue
+
+                    phase["bytes"] += entry.position
+                    phase["seconds"] += time.monotonic() - start
+        except BrokenPipeError as error:
+            raise RestoreError("Filestore restore failed.") from error
+        finally:
+            for process in [psql, tar_process]:
+                if not process.stdin.closed:
+                    process.stdin.close()
+                process.wait()
+
+        if not restored:
+            raise RestoreError("No dump.sql found in backup.")
+        if tar_process.returncode:
+            raise RestoreError("Filestore restore failed.")
+
+        return list(phases.values())
+
+    @staticmethod
+    def _add_file(tar, entry, database):
+        """Add filestore zip `entry` to `tar`, under `database` filestore."""
+
+        name = entry.name[len("filestore/") :]
+        tarinfo = tarfile.TarInfo(f"filestore/{database}/{name}")
+        tarinfo.mtime = time.mktime(entry.date_time + (0, 0, -1))
+        fileobj = entry
+
+        # Tar headers need the size, unknown until read for some zip writers
+        if entry.size is None:
+            fileobj = io.BytesIO(entry.read())
+            tarinfo.size = len(fileobj.getvalue())
+        else:
+            tarinfo.size = entry.size
+
+        tar.addfile(tarinfo, fileobj)
+
+    def _restore_dump(self, stream, container, database, pg_user, options):
+        start = time.monotonic()
+        position = stream.position
+        jobs = options.get("jobs") or 1
+        args = ["pg_restore", "--no-owner", "-U", pg_user, "-d", database]
+
+        if jobs == 1:
+            if self._feed(container.popen(args), stream):
+                raise RestoreError("Database restore failed.")
+            size = stream.position - position
+
+        # pg_restore needs a seekable archive to run parallel jobs, the
+        # dump is copied once into the container
+        else:
+            if stream.is_local:
+                size = os.path.getsize(self.filepath)
+                copied = container.copy_to(self.filepath, vars.RESTORE_DUMP_PATH)
+            else:
+                process = container.popen(
+                    ["sh", "-c", f"cat > {vars.RESTORE_DUMP_PATH}"]
+                )
+                copied = not self._feed(process, stream)
+                size = stream.position - position
+            if not copied:
+                raise RestoreError("Unable to copy dump to database container.")
+
+            success = container.execute(
+                [*args, f"--jobs={jobs}", vars.RESTORE_DUMP_PATH]
+            )
+            container.execute(["rm", "-f", vars.RESTORE_DUMP_PATH])
+            if not success:
+                raise RestoreError("Database restore failed.")
+
+        return {
+            "phase": "database",
+            "bytes": size,
+            "seconds": time.monotonic() - start,
+        }
@@ -0,0 +1,194 @@
+import hashlib
+import logging
+import os
+import re
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from shutil import rmtree
+from urllib.parse import urlsplit, urlunsplit
+
+from apixdev.core.settings import settings
+from apixdev.core.tools import get_dir_size
+
+_logger = logging.getLogger(__name__)
+
+# Mirrors are shared through alternates, their objects must never be deleted
+MIRROR_CONFIG = {
+    "gc.auto": "0",
+    "gc.pruneExpire": "never",
+    "remote.origin.fetch": "+refs/heads/*:refs/heads/*",
+}
+
+
+def _run_git(args, **kwargs):
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    return subprocess.run(
+        ["git", *args],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        env=env,
+        check=True,
+        **kwargs,
+    )
+
+
+def normalize_url(url):
+    """Return url without credentials nor trailing .git, used as cache key."""
+
+    parts = urlsplit(url)
+    if parts.scheme and parts.hostname:
+        netloc = parts.hostname + (f":{parts.port}" if parts.port else "")
+        url = urlunsplit((parts.scheme, netloc, parts.path, "", ""))
+
+    url = url.rstrip("/")
+    return url[:-4] if url.endswith(".git") else url
+
+
+class GitCache:
+    """Bare mirrors shared by all projects through git alternates."""
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+
+    @classmethod
+    def from_path(cls, path=None):
+        """Return GitCache object from path (default in workdir)."""
+        if not path:
+            path = os.path.join(settings.workdir, ".apix", "git")
+        return cls(path)
+
+    def get_mirror_path(self, url):
+        """Return mirror path for remote url."""
+
+        url = normalize_url(url)
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "_", url.split("://")[-1]).strip("_")
+        digest = hashlib.sha1(url.encode("utf8")).hexdigest()[:8]
+
+        return os.path.join(self.path, f"{name}-{digest}.git")
+
+    def _get_lock(self, mirror_path):
+        with self._locks_guard:
+            return self._locks.setdefault(mirror_path, threading.Lock())
+
+    def ensure(self, url):
+        """Clone mirror for url if missing, return its path or False."""
+
+        mirror_path = self.get_mirror_path(url)
+
+        with self._get_lock(mirror_path):
+            if os.path.isdir(mirror_path):
+                return mirror_path
+
+            os.makedirs(self.path, exist_ok=True)
+            tmp_path = f"{mirror_path}.tmp-{os.getpid()}"
+
+            try:
+                _logger.info("Create git cache for %s", normalize_url(url))
+                _run_git(["clone", "--bare", "--quiet", url, tmp_path])
+                for key, value in MIRROR_CONFIG.items():
+                    _run_git(["config", key, value], cwd=tmp_path)
+                os.rename(tmp_path, mirror_path)
+            except (subprocess.CalledProcessError, OSError) as error:
+                _logger.warning("Unable to cache %s: %s", normalize_url(url), error)
+                rmtree(tmp_path, ignore_errors=True)
+                # Another process may have created it meanwhile
+                return mirror_path if os.path.isdir(mirror_path) else False
+
+        return mirror_path
+
+    def link(self, repository_path, urls):
+        """Init repository borrowing objects from the mirrors of its remotes."""
+
+        mirrors = list(filter(bool, map(self.ensure, urls)))
+        if not mirrors:
+            return False
+
+        _run_git(["init", "--quiet", repository_path])
+        alternates = os.path.join(repository_path, ".git", "objects", "info")
+
+        os.makedirs(alternates, exist_ok=True)
+        with open(os.path.join(alternates, "alternates"), "w", encoding="utf8") as file:
+            for mirror_path in mirrors:
+                file.write(os.path.join(mirror_path, "objects") + "\n")
+
+        return True
+
+    def get_mirrors(self):
+        """Return all mirrors paths."""
+
+        if not os.path.isdir(self.path):
+            return []
+
+        return sorted(
+            entry.path
+            for entry in os.scandir(self.path)
+            if entry.is_dir() and entry.name.endswith(".git")
+        )
+
+    def get_users(self, projects):
+        """Return dict {mirror path: repositories borrowing its objects}."""
+
+        res = {mirror_path: [] for mirror_path in self.get_mirrors()}
+
+        for project in projects:
+            for repository_path in project.get_repositories():
+                alternates = os.path.join(
+                    repository_path, ".git", "objects", "info", "alternates"
+                )
+                if not os.path.exists(alternates):
+                    continue
+                with open(alternates, encoding="utf8") as file:
+                    for line in file.read().splitlines():
+                        mirror_path = os.path.dirname(line.strip())
+                        res.setdefault(mirror_path, []).append(repository_path)
+
+        return res
+
+    def _fetch_mirror(self, mirror_path):
+        try:
+            _run_git(["fetch", "--quiet", "--prune", "origin"], cwd=mirror_path)
+        except subprocess.CalledProcessError as error:
+            return {"mirror": mirror_path, "success": False, "output": error.output}
+        return {"mirror": mirror_path, "success": True, "output": ""}
+
+    def fetch(self, jobs=None):
+        """Fetch all mirrors, `jobs` at a time."""
+
+        jobs = jobs or settings.jobs
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(self._fetch_mirror, self.get_mirrors()))
+
+    def prune(self, projects):
+        """Remove mirrors no longer used by any project repository."""
+
+        removed = []
+        for mirror_path, users in self.get_users(projects).items():
+            if not users and os.path.isdir(mirror_path):
+                rmtree(mirror_path)
+                removed.append(mirror_path)
+
+        return removed
+
+    def status(self, projects):
+        """Return mirrors usage and disk space saved."""
+
+        res = []
+        for mirror_path, users in self.get_users(projects).items():
+            if not os.path.isdir(mirror_path):
+                continue
+            size = get_dir_size(mirror_path)
+            res.append(
+                {
+                    "name": os.path.basename(mirror_path),
+                    "size": size,
+                    "users": len(users),
+                    # Each user would otherwise hold its own copy
+                    "saved": max(len(users) - 1, 0) * size,
+                }
+            )
+
+        return res
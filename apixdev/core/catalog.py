@@ -0,0 +1,134 @@
+import logging
+import os
+import sqlite3
+
+from apixdev.core.settings import settings, vars
+
+_logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS saas_database (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    uuid TEXT,
+    major_version TEXT,
+    manifest_url TEXT,
+    repositories_url TEXT,
+    compose_url TEXT,
+    write_date TEXT
+);
+CREATE INDEX IF NOT EXISTS saas_database_name ON saas_database (name);
+"""
+
+
+def trigrams(text):
+    """Return set of trigrams of text, padded to weight word boundaries."""
+
+    text = f"  {text.lower()} "
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(query, name):
+    """Return ranking score of name for query (higher is better)."""
+
+    query, name = query.lower(), name.lower()
+    query_trigrams, name_trigrams = trigrams(query), trigrams(name)
+    score = len(query_trigrams & name_trigrams) / len(query_trigrams | name_trigrams)
+
+    # Substring matches (former `ilike` search) always rank first
+    if query in name:
+        score += 1
+    if name.startswith(query):
+        score += 1
+
+    return score
+
+
+class Catalog:
+    """Local copy of ApiX databases, synchronized on write_date."""
+
+    def __init__(self, path):
+        self.path = path
+        self._cr = None
+
+    @classmethod
+    def from_path(cls, path=None):
+        """Return Catalog object from path (default in config directory)."""
+        return cls(path or settings.catalog_file)
+
+    @property
+    def cr(self):
+        """SQLite connection, database is created on first use."""
+
+        if self._cr is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._cr = sqlite3.connect(self.path)
+            self._cr.row_factory = sqlite3.Row
+            self._cr.executescript(SCHEMA)
+        return self._cr
+
+    @property
+    def is_empty(self):
+        """Check if catalog has never been synchronized."""
+
+        return not self.cr.execute("SELECT 1 FROM saas_database LIMIT 1").fetchone()
+
+    @property
+    def last_write_date(self):
+        """Most recent write_date known locally."""
+
+        row = self.cr.execute("SELECT MAX(write_date) FROM saas_database").fetchone()
+        return row[0]
+
+    def sync(self, odoo, prune=False):
+        """Fetch databases modified since last sync, return their count.
+
+        With `prune`, databases deleted or archived on ApiX are removed,
+        their ids are compared with the server ones.
+        """
+
+        records = odoo.get_databases_since(self.last_write_date)
+        columns = ["id", *vars.CATALOG_FIELDS]
+        deleted = []
+
+        if prune:
+            ids = set(odoo.get_database_ids())
+            local_ids = self.cr.execute("SELECT id FROM saas_database").fetchall()
+            deleted = [(row[0],) for row in local_ids if row[0] not in ids]
+
+        with self.cr:
+            self.cr.executemany(
+                f"INSERT OR REPLACE INTO saas_database ({', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})",
+                [[record.get(key) or None for key in columns] for record in records],
+            )
+            self.cr.executemany("DELETE FROM saas_database WHERE id = ?", deleted)
+
+        _logger.debug(
+            "Catalog synchronized: %s record(s), %s removed", len(records), len(deleted)
+        )
+        return len(records)
+
+    def get(self, name):
+        """Return database with exact name, None if unknown."""
+
+        row = self.cr.execute(
+            "SELECT * FROM saas_database WHERE name = ?", (name,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def names(self):
+        """Return all database names."""
+
+        return [row[0] for row in self.cr.execute("SELECT name FROM saas_database")]
+
+    def search(self, query, limit=None):
+        """Return database names ranked by similarity with query."""
+
+        scores = ((similarity(query, name), name) for name in self.names())
+        res = sorted(
+            (item for item in scores if item[0] >= vars.CATALOG_MIN_SCORE),
+            key=lambda item: (-item[0], item[1]),
+        )
+
+        return [name for _, name in res[:limit]]
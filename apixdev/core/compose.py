@@ -1,13 +1,56 @@
+import copy
 import logging
 import os
+import threading
 
-import requests
 import yaml
 
-from apixdev.core.tools import dict_merge, nested_set
+import apixdev.vars as vars
+from apixdev.core.tools import dict_merge, get_http_session, nested_set
+
+try:
+    # libyaml bindings are much faster than the pure Python implementation
+    from yaml import CSafeDumper as SafeDumper, CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeDumper, SafeLoader
 
 _logger = logging.getLogger(__name__)
 
+# Parsed documents by path: (mtime_ns, size, content)
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_yaml(stream):
+    """Parse YAML document."""
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump_yaml(content):
+    """Serialize content to UTF-8 encoded YAML."""
+    return yaml.dump(content, Dumper=SafeDumper, encoding="utf-8")
+
+
+def load_yaml_file(path):
+    """Parse YAML file, documents are cached until the file changes.
+
+    A copy is returned so callers can modify it freely.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    with _cache_lock:
+        cached = _cache.get(path)
+    if cached and cached[0] == key:
+        return copy.deepcopy(cached[1])
+
+    with open(path, mode="rb") as file:
+        content = load_yaml(file.read())
+
+    with _cache_lock:
+        _cache[path] = (key, content)
+    return copy.deepcopy(content)
+
 
 class Compose:
     _name = "docker-compose.yaml"
@@ -23,24 +66,22 @@ class Compose:
         """Return Compose object from path."""
 
         name = os.path.basename(path)
-        with open(path, mode="rb") as file:
-            return cls(yaml.safe_load(file.read()), name)
+        return cls(load_yaml_file(path), name)
 
     @classmethod
     def from_string(cls, content):
         """Return Compose object from YAML string."""
 
-        content = yaml.safe_load(content)
-        return cls(yaml.safe_load(content))
+        return cls(load_yaml(content))
 
     @classmethod
     def from_url(cls, url):
         """Return Compose object from url."""
 
-        response = requests.get(url, timeout=60)
+        response = get_http_session().get(url, timeout=vars.DEFAULT_TIMEOUT)
         name = os.path.basename(url)
 
-        return cls(yaml.safe_load(response.content), name)
+        return cls(load_yaml(response.content), name)
 
     def get_path(self, path):
         "Return complete filepath."
@@ -63,16 +104,34 @@ class Compose:
         dict_merge(self._content, vals)
 
     def save(self, filepath):
-        """Save compose object to filepath."""
+        """Save compose object to filepath.
+
+        Nothing is written if the file already has the same content,
+        otherwise the file is replaced atomically.
+        Return True if the file has been written.
+        """
 
         assert self._content, "No content to save."
 
-        if os.path.exists(filepath):
-            _logger.debug("Remove '%s'", filepath)
-            os.remove(filepath)
+        content = dump_yaml(self._content)
 
-        with open(filepath, mode="wb") as file:
-            yaml.dump(self._content, file, encoding="utf-8")
+        if os.path.exists(filepath):
+            with open(filepath, mode="rb") as file:
+                if file.read() == content:
+                    _logger.debug("'%s' unchanged", filepath)
+                    return False
+
+        tmp_filepath = f"{filepath}.tmp"
+        with open(tmp_filepath, mode="wb") as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_filepath, filepath)
+
+        with _cache_lock:
+            _cache.pop(filepath, None)
+
+        return True
 
     def extract(self, chain):
         """Extract values from chain."""
@@ -1,6 +1,128 @@
-from apixdev.core.exceptions import NoContainerFound
+import http.client
+import json
+import logging
+import os
+import re
+import socket
+import stat
+import subprocess
+import threading
+import time
+from urllib.parse import urlencode
+
+from apixdev.core.exceptions import DockerEngineError, NoContainerFound, StackNotReady
 from apixdev.core.settings import vars
-from apixdev.core.tools import convert_stdout_to_json, run_external_command
+from apixdev.core.tools import (
+    get_http_session,
+    iter_docker_records,
+    run_external_command,
+)
+
+_logger = logging.getLogger(__name__)
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a unix socket."""
+
+    def __init__(self, socket_path, timeout=vars.DOCKER_API_TIMEOUT):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerClient:
+    """Minimal Docker Engine API client.
+
+    One persistent connection per socket and thread, http.client
+    connections can not be shared between threads.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._local = threading.local()
+
+    @classmethod
+    def new(cls, socket_path=None):
+        """Return shared client for socket path (default from DOCKER_HOST)."""
+
+        socket_path = socket_path or cls.get_socket_path()
+        with cls._instances_lock:
+            if socket_path not in cls._instances:
+                cls._instances[socket_path] = cls(socket_path)
+            return cls._instances[socket_path]
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = UnixHTTPConnection(self.socket_path)
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def get_socket_path():
+        """Return Docker socket path, False if Docker is not reachable by socket."""
+
+        host = os.environ.get("DOCKER_HOST", "")
+        if not host:
+            return vars.DOCKER_SOCKET
+        if host.startswith("unix://"):
+            return host[len("unix://") :]
+        return False
+
+    @property
+    def is_available(self):
+        """Check if the socket exists."""
+
+        if not self.socket_path:
+            return False
+        try:
+            return stat.S_ISSOCK(os.stat(self.socket_path).st_mode)
+        except OSError:
+            return False
+
+    def close(self):
+        """Close persistent connection of current thread."""
+        self._connection.close()
+
+    def _request(self, method, path, params=None):
+        url = f"{path}?{urlencode(params)}" if params else path
+
+        try:
+            response = self._send(method, url)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            # Keep-alive connection closed by the daemon, retry once
+            self._connection.close()
+            response = self._send(method, url)
+
+        body = response.read()
+        if response.status >= 400:
+            raise DockerEngineError(path, response.status, body.decode("utf8"))
+
+        return json.loads(body) if body else None
+
+    def _send(self, method, url):
+        self._connection.request(method, url, headers={"Host": "docker"})
+        return self._connection.getresponse()
+
+    def list_containers(self, labels=None, all_containers=False):
+        """List containers, filtered on labels by the daemon."""
+
+        params = {}
+        if all_containers:
+            params["all"] = "1"
+        if labels:
+            params["filters"] = json.dumps({"label": labels})
+
+        return self._request("GET", "/containers/json", params)
 
 
 class Stack:
@@ -9,6 +131,9 @@ class Stack:
         self.path = path
         self.service_count = 3
 
+        self._snapshot = None
+        self._snapshot_time = 0.0
+
     @property
     def is_running(self):
         """Check if every containers running as excepted."""
@@ -35,50 +160,193 @@ class Stack:
                 cmd = vars.DOCKER_COMPOSE_RUN
 
         run_external_command(cmd, result=False, cwd=self.path)
+        self.invalidate()
+
+    def stop(self, clear=False, quiet=False):
+        """Stop docker-compose stack, return True on success.
 
-    def stop(self, clear=False):
-        """Stop docker-compose stack."""
+        With `quiet` docker compose output is discarded.
+        """
         cmd = vars.DOCKER_COMPOSE_DOWN.split(" ")
+        kwargs = {}
 
         if clear:
             cmd.append("-v")
+        if quiet:
+            kwargs = {"stdout": subprocess.DEVNULL, "stderr": subprocess.DEVNULL}
 
-        run_external_command(cmd, result=False, cwd=self.path)
+        res = run_external_command(cmd, result=False, cwd=self.path, **kwargs)
+        self.invalidate()
+
+        return res
 
     def clear(self):
         """Stop and clear docker-compose stack."""
         self.stop(True)
 
-    def _convert_container_info(self, vals_list):  # pylint: disable=R0201
-        def apply(vals):
-            name = vals.get("Name", vals.get("Names", ""))
-            return {
-                "name": name,
-                "state": vals.get("State", ""),
-            }
+    def wait(self, timeout=vars.WAIT_TIMEOUT, pg_user=None, start=None, callback=None):
+        """Wait until stack is usable, return phases durations.
+
+        Phases are containers running, pg accepting connections and Odoo
+        serving HTTP, polled with backoff. `start` is the time.monotonic()
+        reference of durations (default now), `callback` is called with
+        each phase as soon as it is reached.
+        Raise StackNotReady if Odoo is not serving after `timeout` seconds.
+        """
+        start = start or time.monotonic()
+        deadline = start + timeout
+        health_paths = list(vars.ODOO_HEALTH_PATHS)
+        checks = [
+            ("containers", self._check_containers),
+            ("pg", lambda: self._check_pg(pg_user or vars.DEFAULT_PG_USER)),
+            ("odoo", lambda: self._check_odoo(health_paths)),
+        ]
+        phases = []
+        last = start
+
+        for phase, check in checks:
+            delay = vars.WAIT_BACKOFF[0]
+            while not check():
+                if time.monotonic() + delay > deadline:
+                    raise StackNotReady(phase, timeout)
+                time.sleep(delay)
+                delay = min(delay * 2, vars.WAIT_BACKOFF[1])
+
+            now = time.monotonic()
+            res = {"phase": phase, "seconds": now - last, "elapsed": now - start}
+            phases.append(res)
+            last = now
+
+            if callback:
+                callback(res)
+
+        return phases
+
+    def _check_containers(self):
+        self.invalidate()
+        if not self.is_running:
+            return False
+        return bool(self._get_container_name("pg") and self._get_container_name("odoo"))
+
+    def _check_pg(self, pg_user):
+        container = self.get_container("pg")
+        return container.execute(
+            ["pg_isready", "-q", "-U", pg_user],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def _check_odoo(self, health_paths):  # pylint: disable=R0201
+        """Return True if Odoo answers, `health_paths` are tried in order."""
+        from requests.exceptions import RequestException  # pylint: disable=C0415
+
+        try:
+            response = get_http_session().get(
+                f"{vars.LOCAL_URL}{health_paths[0]}",
+                timeout=vars.WAIT_BACKOFF[1],
+                allow_redirects=False,
+            )
+        except RequestException:
+            return False
+
+        # /web/health only exists since Odoo 17.0
+        if response.status_code == 404 and len(health_paths) > 1:
+            health_paths.pop(0)
+            return False
 
-        return list(map(apply, vals_list))
+        return response.status_code < 400
+
+    @property
+    def project_name(self):
+        """Docker compose project name (normalized directory name)."""
+        return re.sub(r"[^a-z0-9_-]", "", self.name.lower())
+
+    @staticmethod
+    def get_running_projects():
+        """Return compose project names with running containers, one query."""
+        label = vars.DOCKER_COMPOSE_PROJECT_LABEL
+        client = DockerClient.new()
+
+        if client.is_available:
+            try:
+                containers = client.list_containers(labels=[label])
+            except (OSError, http.client.HTTPException, DockerEngineError) as error:
+                _logger.debug("Docker Engine API unavailable: %s", error)
+            else:
+                return {vals["Labels"][label] for vals in containers}
+
+        def convert(vals):
+            labels = dict(
+                item.split("=", 1) for item in vals.get("Labels", "").split(",") if item
+            )
+            return labels.get(label)
+
+        records = iter_docker_records(vars.DOCKER_PS_LABEL.format(label), convert)
+        return set(filter(None, records))
+
+    def _convert_api_container_info(self, vals):  # pylint: disable=R0201
+        names = vals.get("Names") or [""]
+        return {
+            "name": names[0].lstrip("/"),
+            "state": vals.get("State", ""),
+        }
+
+    def _convert_container_info(self, vals):  # pylint: disable=R0201
+        name = vals.get("Name", vals.get("Names", ""))
+        return {
+            "name": name,
+            "state": vals.get("State", ""),
+        }
+
+    def invalidate(self):
+        """Drop inspection snapshot, next call will inspect the stack again."""
+        self._snapshot = None
 
     def _inspect_services(self):
+        """Return containers info, inspected at most once per TTL."""
+        age = time.monotonic() - self._snapshot_time
+
+        if self._snapshot is None or age > vars.DOCKER_INSPECT_TTL:
+            self._snapshot = self._inspect()
+            self._snapshot_time = time.monotonic()
+
+        return self._snapshot
+
+    def _inspect(self):
+        client = DockerClient.new()
+
+        if client.is_available:
+            label = f"{vars.DOCKER_COMPOSE_PROJECT_LABEL}={self.project_name}"
+            try:
+                containers = client.list_containers(labels=[label])
+            except (OSError, http.client.HTTPException, DockerEngineError) as error:
+                _logger.debug("Docker Engine API unavailable: %s", error)
+            else:
+                return list(map(self._convert_api_container_info, containers))
+
+        return self._inspect_services_cli()
+
+    def _inspect_services_cli(self):
         # Method 1 : docker compose ps
-        res = run_external_command(vars.DOCKER_COMPOSE_PS, cwd=self.path)
-        data = convert_stdout_to_json(res)
+        data = list(
+            iter_docker_records(
+                vars.DOCKER_COMPOSE_PS, self._convert_container_info, cwd=self.path
+            )
+        )
 
         if len(data) == vars.DOCKER_SERVICES_COUNT:
-            return self._convert_container_info(data)
+            return data
 
         # When the stack is not running in background,
         # the odoo container does not appear with the first ps command
 
-        # Method 2 : docker ps + filtering on project name
-        res = run_external_command(vars.DOCKER_PS, cwd=self.path)
-        data = convert_stdout_to_json(res)
-
-        data = list(
-            filter(lambda item: item.get("Names", "").startswith(self.name), data)
+        # Method 2 : docker ps filtered on compose project label
+        cmd = vars.DOCKER_PS.format(
+            vars.DOCKER_COMPOSE_PROJECT_LABEL, self.project_name
         )
+        records = iter_docker_records(cmd, self._convert_container_info, cwd=self.path)
 
-        return self._convert_container_info(data)
+        return list(records)
 
     def _get_container_names(self):
         if not self.is_running:
@@ -141,6 +409,39 @@ class Container:
 
         return True
 
+    def popen(self, args, **kwargs):
+        """Start command in container, stdin is piped to be fed by caller."""
+
+        cmd = ["docker", "exec", "-i", self.name, *args]
+        return subprocess.Popen(  # pylint: disable=R1732
+            cmd, stdin=subprocess.PIPE, cwd=self.path, **kwargs
+        )
+
+    def execute(self, args, **kwargs):
+        """Run command in container, return True on success."""
+
+        cmd = ["docker", "exec", self.name, *args]
+        return run_external_command(cmd, result=False, cwd=self.path, **kwargs)
+
+    def copy_to(self, filepath, container_path):
+        """Copy local file into container, return True on success."""
+
+        cmd = ["docker", "cp", filepath, f"{self.name}:{container_path}"]
+        return run_external_command(cmd, result=False, cwd=self.path)
+
+    def get_output(self, args):
+        """Run command in container, return its output or None on failure."""
+
+        cmd = ["docker", "exec", self.name, *args]
+        try:
+            output = run_external_command(cmd, cwd=self.path, stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError as error:
+            _logger.debug("%s failed: %s", " ".join(args), error)
+            return None
+
+        # False when docker is not found
+        return None if output is False else output.decode("utf8")
+
     def bash(self):
         """Attach to container bash"""
         if not self.is_running:
@@ -157,7 +458,7 @@ class OdooContainer(Container):
         super().__init__(stack, "odoo", name)
 
     def install_modules(self, database, modules, **kwargs):
-        """Install modules list to Odoo database"""
+        """Install modules list to Odoo database, return True on success"""
         if not self.is_running:
             return False
 
@@ -165,9 +466,15 @@ class OdooContainer(Container):
         odoo_cmd = vars.ODOO_MODULES.format(database, odoo_arg, modules)
         cmd = vars.DOCKER_EXEC.format(self.name, odoo_cmd).split()
 
-        run_external_command(cmd, result=False, cwd=self.path)
+        return run_external_command(cmd, result=False, cwd=self.path)
 
-        return True
+    def get_modules(self):
+        """Return names of modules found in Odoo addons paths, None on error."""
+        if not self.is_running:
+            return None
+
+        output = self.get_output(["python3", "-c", vars.ODOO_LIST_MODULES])
+        return set(output.split()) if output else None
 
     def shell(self, database):
         """Attach to Odoo Shell"""
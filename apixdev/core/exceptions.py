@@ -20,6 +20,44 @@ class NoContainerFound(Exception):
         super().__init__(self.message)
 
 
+class DockerEngineError(Exception):
+    """Exception raised for Docker Engine API errors."""
+
+    def __init__(self, path, http_code, reason=""):
+        self.path = path
+        self.http_code = http_code
+        self.message = f"Docker Engine API error on {path} (HTTP {http_code}) {reason}"
+        super().__init__(self.message.strip())
+
+
+class RequirementsConflict(Exception):
+    """Exception raised when requirements can not be satisfied or pinned."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        details = "\n".join(f"{name}: {reason}" for name, reason in conflicts.items())
+        self.message = f"Unable to resolve requirements:\n{details}"
+        super().__init__(self.message)
+
+
+class RestoreError(Exception):
+    """Exception raised for backup restore errors."""
+
+    def __init__(self, message):
+        self.message = message
+        super().__init__(self.message)
+
+
+class StackNotReady(Exception):
+    """Exception raised when a stack is not usable in time."""
+
+    def __init__(self, phase, timeout):
+        self.phase = phase
+        self.timeout = timeout
+        self.message = f"Stack not ready after {timeout}s, waiting for {phase}."
+        super().__init__(self.message)
+
+
 class ExternalDependenciesMissing(Exception):
     """Exception raised for system package missing ."""
 
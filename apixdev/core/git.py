@@ -0,0 +1,115 @@
+import logging
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+_logger = logging.getLogger(__name__)
+
+SHA_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+
+def _git_env():
+    # Never block on credentials prompt, fail instead
+    return dict(os.environ, GIT_TERMINAL_PROMPT="0")
+
+
+def ls_remote(url, refs):
+    """Resolve refs on remote url with a single ls-remote call.
+
+    Return dict {ref: sha}, unresolved refs are mapped to None.
+    """
+
+    refs = sorted(set(refs))
+    res = {ref: ref if SHA_PATTERN.match(ref) else None for ref in refs}
+    patterns = [ref for ref in refs if not res[ref]]
+
+    if not patterns:
+        return res
+
+    try:
+        output = subprocess.run(
+            ["git", "ls-remote", url, *patterns],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=_git_env(),
+            check=True,
+        ).stdout.decode("utf8")
+    except (subprocess.CalledProcessError, FileNotFoundError) as error:
+        _logger.debug("ls-remote %s failed: %s", url, error)
+        return res
+
+    remote_refs = {}
+    for line in output.splitlines():
+        sha, name = line.split("\t", 1)
+        remote_refs[name] = sha
+
+    for ref in patterns:
+        # Same precedence as git: exact name, then branches, then tags
+        candidates = [ref, f"refs/heads/{ref}", f"refs/tags/{ref}"]
+        res[ref] = next(
+            (remote_refs[name] for name in candidates if name in remote_refs), None
+        )
+
+    return res
+
+
+def ls_remotes(refs_by_url, jobs=1):
+    """Resolve refs on several remotes, `jobs` remotes at a time.
+
+    `refs_by_url` is a dict {url: refs}, return dict {url: {ref: sha}}.
+    """
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        results = executor.map(lambda item: ls_remote(*item), refs_by_url.items())
+        return dict(zip(refs_by_url.keys(), results))
+
+
+def rev_parse(path, ref="HEAD"):
+    """Return sha of `ref` in local repository, or None."""
+
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", f"{ref}^{{commit}}"],
+            cwd=path,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        ).stdout
+    except (subprocess.CalledProcessError, FileNotFoundError, OSError):
+        return None
+
+    return output.decode("utf8").strip() or None
+
+
+def get_changed_files(path, since):
+    """Return files changed in local repository since commit `since`.
+
+    Committed, uncommitted and untracked changes are included, paths are
+    relative to the repository. Return None if `since` is unknown.
+    """
+
+    if not rev_parse(path, since):
+        return None
+
+    commands = [
+        ["git", "diff", "--name-only", "--no-renames", since],
+        ["git", "ls-files", "--others", "--exclude-standard"],
+    ]
+    files = set()
+
+    for cmd in commands:
+        try:
+            output = subprocess.run(
+                cmd,
+                cwd=path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                check=True,
+            ).stdout
+        except (subprocess.CalledProcessError, FileNotFoundError) as error:
+            _logger.debug("%s failed: %s", " ".join(cmd), error)
+            return None
+        files.update(filter(None, output.decode("utf8").splitlines()))
+
+    return sorted(files)
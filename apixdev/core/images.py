@@ -1,9 +1,22 @@
+import json
+import os
+import subprocess
+import tempfile
+
 from apixdev.core.settings import settings, vars
-from apixdev.core.tools import bytes_to_json, dict_to_dataframe, run_external_command
+from apixdev.core.tools import iter_docker_records, run_external_command
 
 # pylint: disable=C0103
 
 
+def _convert_image_info(vals):
+    return {
+        "tag": vals.get("Tag", ""),
+        "size": vals.get("Size", ""),
+        "created": vals.get("CreatedAt", ""),
+    }
+
+
 class Images:
     def __init__(self):
         pass
@@ -14,14 +27,59 @@ class Images:
 
         repository = settings.get_var("docker.repository")
 
-        res = run_external_command(vars.DOCKER_LIST_IMAGES)
-        data = bytes_to_json(res)
-        df = dict_to_dataframe(data)
-        df2 = df.query(f"Repository == '{repository}'")
+        records = iter_docker_records(vars.DOCKER_LIST_IMAGES)
+        res = [
+            _convert_image_info(vals)
+            for vals in records
+            if vals.get("Repository") == repository
+        ]
+
+        return sorted(res, key=lambda item: item["tag"])
+
+    @staticmethod
+    def inspect(name):
+        """Return local image details, False if image is not found."""
+
+        cmd = vars.DOCKER_IMAGE_INSPECT.format(name)
+
+        try:
+            res = run_external_command(cmd, stderr=subprocess.DEVNULL)
+        except subprocess.CalledProcessError:
+            return False
+
+        return json.loads(res)[0] if res else False
+
+    @staticmethod
+    def pull(name):
+        """Pull image, return True on success."""
+
+        return run_external_command(vars.DOCKER_PULL.format(name), result=False)
+
+    @staticmethod
+    def build(tag, image, requirements):
+        """Build `tag` image from `image` with requirements preinstalled.
+
+        Pip downloads are kept in a BuildKit cache mount shared by all builds.
+        """
+
+        info = Images.inspect(image)
+        if not info and Images.pull(image):
+            info = Images.inspect(image)
+        if not info:
+            return False
+
+        user = info.get("Config", {}).get("User") or "root"
+        dockerfile = vars.BAKE_DOCKERFILE.format(image=image, user=user)
 
-        # TODO: Return image size
-        # df2[["Tag", "Size"]].to_dict(orient="records")
+        with tempfile.TemporaryDirectory() as path:
+            with open(os.path.join(path, "Dockerfile"), "w", encoding="utf8") as file:
+                file.write(dockerfile)
+            with open(
+                os.path.join(path, "requirements.txt"), "w", encoding="utf8"
+            ) as file:
+                file.write("\n".join(requirements) + "\n")
 
-        res = sorted(df2["Tag"].tolist())
+            cmd = vars.DOCKER_BUILD.format(tag, path)
+            env = dict(os.environ, DOCKER_BUILDKIT="1")
 
-        return res
+            return run_external_command(cmd, result=False, env=env)
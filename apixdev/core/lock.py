@@ -0,0 +1,215 @@
+import logging
+import os
+import platform
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import unquote, urlsplit
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.specifiers import InvalidSpecifier, SpecifierSet
+from packaging.tags import compatible_tags, cpython_tags
+from packaging.utils import (
+    InvalidSdistFilename,
+    InvalidWheelFilename,
+    canonicalize_name,
+    parse_sdist_filename,
+    parse_wheel_filename,
+)
+from packaging.version import InvalidVersion, Version
+
+from apixdev.core.exceptions import RequirementsConflict
+from apixdev.core.settings import settings, vars
+from apixdev.core.tools import get_http_session
+
+_logger = logging.getLogger(__name__)
+
+# Tags of manylinux wheels built for older glibc, before PEP 600 names
+LEGACY_MANYLINUX = {
+    (2, 17): "manylinux2014",
+    (2, 12): "manylinux2010",
+    (2, 5): "manylinux1",
+}
+
+
+class IndexPageParser(HTMLParser):
+    """Collect links of a simple repository API (PEP 503) project page."""
+
+    def __init__(self):
+        super().__init__()
+        self.links = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "a" and attrs.get("href"):
+            self.links.append(attrs)
+
+
+def get_image_tags(python_version):
+    """Return wheel tags installable in an Odoo image running `python_version`.
+
+    Images are CPython on Linux glibc, for the architecture of this host.
+    """
+
+    arch = {"arm64": "aarch64", "amd64": "x86_64"}.get(
+        platform.machine().lower(), platform.machine().lower()
+    )
+    major, minor = vars.IMAGE_GLIBC_VERSION
+
+    platforms = []
+    for glibc_minor in range(minor, 4, -1):
+        platforms.append(f"manylinux_{major}_{glibc_minor}_{arch}")
+        if (major, glibc_minor) in LEGACY_MANYLINUX:
+            platforms.append(f"{LEGACY_MANYLINUX[major, glibc_minor]}_{arch}")
+    platforms.append(f"linux_{arch}")
+
+    version = python_version.release[:2]
+    interpreter = f"cp{version[0]}{version[1]}"
+    return set(cpython_tags(version, platforms=platforms)) | set(
+        compatible_tags(version, interpreter, platforms)
+    )
+
+
+def parse_distribution_filename(filename):
+    """Return (name, version) from wheel or sdist filename, None if invalid."""
+
+    try:
+        if filename.endswith(".whl"):
+            name, version, _, _ = parse_wheel_filename(filename)
+        else:
+            name, version = parse_sdist_filename(filename)
+    except (InvalidWheelFilename, InvalidSdistFilename, InvalidVersion):
+        return None
+
+    return name, version
+
+
+class RequirementsLocker:
+    """Pin requirements to exact versions available on an index or directory."""
+
+    def __init__(self, index_url=None, wheel_dir=None, jobs=None, **kwargs):
+        self.index_url = (index_url or settings.pip_index).rstrip("/")
+        self.wheel_dir = wheel_dir or settings.wheel_dir
+        self.jobs = jobs or settings.jobs
+        self.python_version = Version(
+            kwargs.get("python_version") or settings.python_version
+        )
+
+        self.tags = get_image_tags(self.python_version)
+
+        self._local_versions = None
+
+    def _is_compatible(self, filename):
+        """Check if a wheel can be installed in the image, sdists always can."""
+
+        if not filename.endswith(".whl"):
+            return True
+        _, _, _, tags = parse_wheel_filename(filename)
+        return not self.tags.isdisjoint(tags)
+
+    def _get_local_versions(self):
+        if self._local_versions is None:
+            # Built aside, pinning threads must never see a partial listing
+            versions = {}
+            for filename in os.listdir(self.wheel_dir):
+                res = parse_distribution_filename(filename)
+                if res and self._is_compatible(filename):
+                    name, version = res
+                    versions.setdefault(name, set()).add(version)
+            self._local_versions = versions
+
+        return self._local_versions
+
+    def _get_index_versions(self, name):
+        url = f"{self.index_url}/{name}/"
+        response = get_http_session().get(url, timeout=vars.DEFAULT_TIMEOUT)
+        if response.status_code == 404:
+            return set()
+        response.raise_for_status()
+
+        parser = IndexPageParser()
+        parser.feed(response.text)
+
+        versions = set()
+        for link in parser.links:
+            if not self._is_installable(link):
+                continue
+            filename = unquote(os.path.basename(urlsplit(link["href"]).path))
+            res = parse_distribution_filename(filename)
+            if res and res[0] == name and self._is_compatible(filename):
+                versions.add(res[1])
+
+        return versions
+
+    def _is_installable(self, link):
+        """Check if an index file is not yanked and supports image Python."""
+
+        if "data-yanked" in link:
+            return False
+
+        requires_python = link.get("data-requires-python")
+        if not requires_python:
+            return True
+
+        try:
+            specifier = SpecifierSet(requires_python)
+        except InvalidSpecifier:
+            return True
+        return specifier.contains(self.python_version, prereleases=True)
+
+    def get_versions(self, name):
+        """Return available versions for a package."""
+
+        name = canonicalize_name(name)
+        if self.wheel_dir:
+            return self._get_local_versions().get(name, set())
+        return self._get_index_versions(name)
+
+    def _pin(self, requirement):
+        from requests.exceptions import RequestException  # pylint: disable=C0415
+
+        try:
+            versions = self.get_versions(requirement.name)
+        except RequestException as error:
+            return None, f"index request failed: {error}"
+
+        candidates = list(requirement.specifier.filter(sorted(versions)))
+
+        if not versions:
+            return None, "package not found"
+        if not candidates:
+            return None, f"no version matches '{requirement.specifier}'"
+
+        return f"{requirement.name}=={candidates[-1]}", None
+
+    def lock(self, requirements):
+        """Return requirements pinned to the highest matching version.
+
+        Raise RequirementsConflict with every package that can not be pinned.
+        """
+
+        parsed = {}
+        conflicts = {}
+
+        for line in requirements:
+            try:
+                requirement = Requirement(line)
+            except InvalidRequirement as error:
+                conflicts[line] = str(error)
+                continue
+            parsed[line] = requirement
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            results = dict(zip(parsed, executor.map(self._pin, parsed.values())))
+
+        pins = []
+        for line, (pin, reason) in results.items():
+            if reason:
+                conflicts[parsed[line].name] = reason
+            else:
+                pins.append(pin)
+
+        if conflicts:
+            raise RequirementsConflict(conflicts)
+
+        _logger.debug("Locked requirements: %s", pins)
+        return sorted(pins)
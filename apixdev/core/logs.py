@@ -0,0 +1,211 @@
+import logging
+import re
+import subprocess
+import threading
+import time
+from collections import deque
+
+from apixdev.core.settings import vars
+
+_logger = logging.getLogger(__name__)
+
+# Odoo (INFO, WARNING...) and PostgreSQL (LOG, FATAL...) level names
+LEVEL_PATTERN = re.compile(r"\b(DEBUG|INFO|LOG|WARNING|ERROR|CRITICAL|FATAL|PANIC)\b")
+
+
+def parse_level(message):
+    """Return numeric level found at the beginning of a log line, or None."""
+
+    match = LEVEL_PATTERN.search(message, 0, vars.LOGS_LEVEL_SEARCH_LENGTH)
+    if not match:
+        return None
+    return vars.LOG_LEVELS[match.group(1)]
+
+
+def sort_key(timestamp):
+    """Return sortable key of docker RFC3339Nano timestamp.
+
+    Docker trims fraction trailing zeros, they are padded back.
+    """
+
+    seconds, _, fraction = timestamp.rstrip("Z").partition(".")
+    return f"{seconds}.{fraction.ljust(9, '0')}"
+
+
+class LogStream:
+    """Log lines of one container, read by a background thread.
+
+    Lines are filtered before being stored in a bounded ring buffer,
+    when the reader falls behind the oldest lines are dropped, or with
+    `lossless` the thread waits for room instead.
+    """
+
+    def __init__(self, service, process, maxlen, **kwargs):
+        self.service = service
+        self.process = process
+        self.buffer = deque(maxlen=maxlen)
+        self.lossless = kwargs.get("lossless", False)
+        self.dropped = 0
+        self.finished = False
+
+        self._level = kwargs.get("level")
+        self._pattern = kwargs.get("pattern")
+        # Continuation lines (tracebacks) follow their leveled line
+        self._keep = True
+
+    def accept(self, message):
+        """Return True if message passes level and regex filters."""
+
+        if self._level is not None:
+            level = parse_level(message)
+            if level is not None:
+                self._keep = level >= self._level
+            if not self._keep:
+                return False
+
+        if self._pattern is not None and not self._pattern.search(message):
+            return False
+
+        return True
+
+    def read(self, condition):
+        """Read process output until it exits, notify `condition` on new lines."""
+
+        for raw in self.process.stdout:
+            line = raw.decode("utf8", errors="replace").rstrip("\n")
+            timestamp, _, message = line.partition(" ")
+
+            if not self.accept(message):
+                continue
+
+            with condition:
+                while self.lossless and len(self.buffer) == self.buffer.maxlen:
+                    condition.wait()
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.dropped += 1
+                self.buffer.append((sort_key(timestamp), time.monotonic(), message))
+                condition.notify()
+
+        self.process.wait()
+        with condition:
+            self.finished = True
+            condition.notify()
+
+
+class LogFollower:
+    """Stream logs of several containers interleaved by timestamp.
+
+    `containers` are Container objects, `since` and `tail` are passed to
+    docker so filtering by time happens server side. Lines are only
+    dropped when following, a finite output is always complete, and
+    `lossless` keeps every line when following too.
+    """
+
+    def __init__(self, containers, **kwargs):
+        self.containers = containers
+        self.since = kwargs.get("since")
+        self.tail = kwargs.get("tail")
+        self.follow = kwargs.get("follow", True)
+        self.lossless = kwargs.get("lossless", not self.follow)
+        self.level = kwargs.get("level")
+        self.pattern = kwargs.get("pattern")
+        self.buffer_size = kwargs.get("buffer_size", vars.LOGS_BUFFER_SIZE)
+        self.streams = []
+
+    def _get_command(self, container):
+        cmd = ["docker", "logs", "--timestamps"]
+
+        if self.since:
+            cmd += ["--since", self.since]
+        if self.tail is not None:
+            cmd += ["--tail", str(self.tail)]
+        if self.follow:
+            cmd.append("--follow")
+
+        return cmd + [container.name]
+
+    def _start(self, condition):
+        level = vars.LOG_LEVELS[self.level] if self.level else None
+        pattern = re.compile(self.pattern) if self.pattern else None
+        maxlen = max(1, self.buffer_size // max(1, len(self.containers)))
+
+        for container in self.containers:
+            process = subprocess.Popen(  # pylint: disable=R1732
+                self._get_command(container),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                cwd=container.path,
+            )
+            stream = LogStream(
+                container.service,
+                process,
+                maxlen,
+                level=level,
+                pattern=pattern,
+                lossless=self.lossless,
+            )
+            self.streams.append(stream)
+
+            threading.Thread(target=stream.read, args=(condition,), daemon=True).start()
+
+    @property
+    def dropped(self):
+        """Number of lines dropped because the ring buffers were full."""
+        return sum(stream.dropped for stream in self.streams)
+
+    def _pop_ready(self, now):
+        """Pop lines that can be emitted in timestamp order."""
+
+        records = []
+
+        while True:
+            heads = [stream for stream in self.streams if stream.buffer]
+            if not heads:
+                return records
+
+            stream = min(heads, key=lambda item: item.buffer[0][0])
+            waiting = [
+                item
+                for item in self.streams
+                if not item.buffer and not item.finished and item is not stream
+            ]
+
+            # An idle stream may still send older lines: wait for it, only
+            # a little while when following
+            if waiting and (
+                not self.follow or now - stream.buffer[0][1] < vars.LOGS_WINDOW
+            ):
+                return records
+
+            _, _, message = stream.buffer.popleft()
+            records.append((stream.service, message))
+
+    def __iter__(self):
+        """Yield (service, message) tuples until all streams end."""
+
+        condition = threading.Condition()
+        self._start(condition)
+
+        try:
+            while True:
+                with condition:
+                    condition.wait(vars.LOGS_WINDOW)
+                    records = self._pop_ready(time.monotonic())
+                    # Wake up lossless readers waiting for room
+                    condition.notify_all()
+                    done = all(stream.finished for stream in self.streams)
+                    done = done and not any(stream.buffer for stream in self.streams)
+
+                yield from records
+
+                if done:
+                    return
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Terminate docker logs processes."""
+
+        for stream in self.streams:
+            if stream.process.poll() is None:
+                stream.process.terminate()
@@ -0,0 +1,242 @@
+import ast
+import difflib
+import json
+import logging
+import os
+from collections import defaultdict, deque
+
+from apixdev.core.settings import vars
+from apixdev.core.tools import find_files
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_FIELDS = ["version", "summary", "depends", "external_dependencies"]
+
+
+def parse_manifest(filepath):
+    """Return module manifest values, without importing the module.
+
+    Raise ValueError if the manifest is not a literal dict.
+    """
+
+    with open(filepath, encoding="utf8") as file:
+        try:
+            vals = ast.literal_eval(file.read())
+        except (SyntaxError, ValueError) as error:
+            raise ValueError(f"Invalid manifest {filepath}: {error}") from error
+
+    if not isinstance(vals, dict):
+        raise ValueError(f"Invalid manifest {filepath}: not a dict")
+
+    return vals
+
+
+class ModuleIndex:
+    """Odoo modules found in project repositories.
+
+    Manifests are parsed once, then only when their mtime or size changed,
+    the index is kept in the project modules file.
+    """
+
+    def __init__(self, project):
+        self.project = project
+        self.modules = {}
+
+    @classmethod
+    def from_project(cls, project):
+        """Return up to date ModuleIndex of `project`."""
+        instance = cls(project)
+        instance.refresh()
+        return instance
+
+    def _read(self):
+        try:
+            with open(self.project.modules_file, encoding="utf8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, index):
+        filepath = self.project.modules_file
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+        tmp_file = f"{filepath}.tmp"
+        with open(tmp_file, "w", encoding="utf8") as file:
+            json.dump(index, file)
+        os.replace(tmp_file, filepath)
+
+    def _make_module(self, entry):
+        path = os.path.dirname(entry.path)
+        vals = parse_manifest(entry.path)
+        relpath = os.path.relpath(path, self.project.repositories_path)
+
+        module = {
+            "name": os.path.basename(path),
+            "repository": relpath.split(os.sep)[0],
+            "path": relpath,
+            "installable": vals.get("installable", True),
+        }
+        module.update({key: vals.get(key) for key in MANIFEST_FIELDS})
+        module["depends"] = module["depends"] or []
+        module["external_dependencies"] = module["external_dependencies"] or {}
+        module["summary"] = module["summary"] or ""
+
+        return module
+
+    def refresh(self):
+        """Scan repositories, parse new or modified manifests only.
+
+        Return True if the index changed.
+        """
+
+        root = os.path.normpath(self.project.repositories_path)
+        index = self._read()
+        found = set()
+        changed = False
+
+        for entry in find_files(root, vars.MODULE_MANIFEST, prune=True):
+            # Entries paths are built from root, cheaper than os.path.relpath
+            key = entry.path[len(root) + 1 :]
+            stat = entry.stat()
+            cached = index.get(key)
+            found.add(key)
+
+            if (
+                cached
+                and cached["mtime"] == stat.st_mtime_ns
+                and cached["size"] == stat.st_size
+            ):
+                continue
+
+            try:
+                module = self._make_module(entry)
+            except (OSError, ValueError) as error:
+                _logger.warning(error)
+                module = None
+
+            index[key] = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "module": module,
+            }
+            changed = True
+
+        for key in set(index) - found:
+            del index[key]
+            changed = True
+
+        if changed:
+            self._write(index)
+
+        # Same module in several repositories: first path wins
+        self.modules = {}
+        for key in sorted(index):
+            module = index[key]["module"]
+            if module:
+                self.modules.setdefault(module["name"], module)
+
+        return changed
+
+    def get(self, name):
+        """Return module dict, or None if unknown."""
+        return self.modules.get(name)
+
+    def search(self, query="", limit=None):
+        """Return modules whose name or summary contain `query`.
+
+        Exact name first, then name prefix, then name and summary matches.
+        """
+
+        query = query.lower()
+
+        def rank(module):
+            name = module["name"]
+            if name == query:
+                return 0
+            if name.startswith(query):
+                return 1
+            if query in name:
+                return 2
+            return 3
+
+        modules = [
+            module
+            for module in self.modules.values()
+            if query in module["name"] or query in module["summary"].lower()
+        ]
+        modules.sort(key=lambda module: (rank(module), module["name"]))
+
+        return modules[:limit]
+
+    def get_modules_in(self, path):
+        """Return installable modules names under `path`.
+
+        `path` is relative to project repositories path.
+        """
+
+        prefix = os.path.join(os.path.normpath(path), "")
+        return sorted(
+            module["name"]
+            for module in self.modules.values()
+            if module["installable"] and module["path"].startswith(prefix)
+        )
+
+    def get_changed_modules(self, files):
+        """Return {module: reason} of installable modules owning `files`.
+
+        `files` are paths relative to project repositories path.
+        """
+
+        paths = {module["path"]: module["name"] for module in self.modules.values()}
+        changes = defaultdict(list)
+
+        for filepath in files:
+            parent = os.path.dirname(filepath)
+            while parent and parent not in paths:
+                parent = os.path.dirname(parent)
+            if parent:
+                changes[paths[parent]].append(filepath)
+
+        reasons = {}
+        for name, filepaths in changes.items():
+            if not self.modules[name]["installable"]:
+                continue
+            more = f" (+{len(filepaths) - 1} files)" if len(filepaths) > 1 else ""
+            reasons[name] = f"changed {filepaths[0]}{more}"
+
+        return reasons
+
+    def add_dependents(self, reasons):
+        """Add installable modules depending on `reasons` modules, recursively.
+
+        `reasons` is a dict {module: reason} updated in place and returned.
+        """
+
+        dependents = defaultdict(list)
+        for module in self.modules.values():
+            for name in module["depends"]:
+                dependents[name].append(module["name"])
+
+        queue = deque(sorted(reasons))
+        while queue:
+            name = queue.popleft()
+            for dependent in sorted(dependents[name]):
+                if dependent in reasons or not self.modules[dependent]["installable"]:
+                    continue
+                reasons[dependent] = f"depends on {name}"
+                queue.append(dependent)
+
+        return reasons
+
+    def validate(self, names, cutoff=vars.MODULE_TYPO_CUTOFF, known=None):
+        """Return {unknown name: close matches} of `names` not in the index.
+
+        `known` are other available module names, e.g. Odoo core modules.
+        """
+
+        known = set(known or ()) | set(self.modules)
+        return {
+            name: difflib.get_close_matches(name, known, n=3, cutoff=cutoff)
+            for name in names
+            if name not in known
+        }
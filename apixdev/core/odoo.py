@@ -1,8 +1,8 @@
+import functools
+import json
 import logging
-import ssl
-import urllib
-
-import odoorpc
+import os
+import time
 
 from apixdev.core.common import SingletonMeta
 from apixdev.core.settings import settings, vars
@@ -10,12 +10,82 @@ from apixdev.core.settings import settings, vars
 _logger = logging.getLogger(__name__)
 
 
+def relogin_on_error(method):
+    """Retry once with a fresh login when a cached session is rejected."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        import odoorpc  # pylint: disable=C0415
+
+        try:
+            return method(self, *args, **kwargs)
+        except odoorpc.error.RPCError as error:
+            if not self._from_session:
+                raise
+            _logger.debug("Cached session rejected (%s), login again", error)
+            self.logout()
+            self._cr = self._connect(use_session=False)
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class RPCOpener:
+    """urllib opener for odoorpc backed by a pooled requests session.
+
+    Connections are kept alive between RPC calls and responses are
+    requested gzip compressed.
+    """
+
+    def __init__(self, verify=True):
+        import requests  # pylint: disable=C0415
+
+        self._session = requests.Session()
+        self._session.headers["Accept-Encoding"] = "gzip, deflate"
+        self._session.verify = verify
+
+        if not verify:
+            import urllib3  # pylint: disable=C0415
+
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    def open(self, request, timeout=None):
+        """Send urllib `request`, return an urllib like response."""
+        import io  # pylint: disable=C0415
+        import urllib.error  # pylint: disable=C0415
+        import urllib.response  # pylint: disable=C0415
+
+        response = self._session.request(
+            request.get_method(),
+            request.full_url,
+            data=request.data,
+            headers=dict(request.header_items()),
+            timeout=timeout,
+        )
+        body = io.BytesIO(response.content)
+
+        if response.status_code >= 400:
+            raise urllib.error.HTTPError(
+                request.full_url,
+                response.status_code,
+                response.reason,
+                response.headers,
+                body,
+            )
+
+        return urllib.response.addinfourl(
+            body, response.headers, response.url, response.status_code
+        )
+
+
 class Odoo(metaclass=SingletonMeta):
     _cr = None
+    _opener = None
     _url = ""
     _db = ""
     _user = ""
     _password = ""
+    _from_session = False
 
     def __init__(self, url, dbname, user, password, **kwargs):
         self._url = url
@@ -37,28 +107,87 @@ class Odoo(metaclass=SingletonMeta):
     def saas_database(self):
         """Return SaaS Database object."""
 
-        return self._cr.env["saas.database"]
+        return self._cr.env[vars.SAAS_DATABASE_MODEL]
 
     def get_params(self):
         """Return Odoo options."""
 
         return {k: v for k, v in self.__dict__.items() if k in vars.ODOORPC_OPTIONS}
 
-    def _connect(self):
+    @staticmethod
+    def logout():
+        """Remove cached session, return True if there was one."""
+
+        if not os.path.exists(settings.session_file):
+            return False
+
+        os.remove(settings.session_file)
+        return True
+
+    def _get_session_key(self):
+        return [self._url, self._db, self._user]
+
+    def _load_session(self):
+        if not os.path.exists(settings.session_file):
+            return None
+
+        try:
+            with open(settings.session_file, encoding="utf8") as file:
+                session = json.load(file)
+        except (OSError, ValueError):
+            return None
+
+        if session.get("key") != self._get_session_key():
+            return None
+        if session.get("expires", 0) < time.time():
+            return None
+
+        return session
+
+    def _save_session(self, obj):
+        session = {
+            "key": self._get_session_key(),
+            "uid": obj.env.uid,
+            "context": obj.env.context,
+            "version": obj.version,
+            "expires": time.time() + vars.SESSION_TTL,
+        }
+
+        # Readable by current user only
+        fd = os.open(
+            settings.session_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "w", encoding="utf8") as file:
+            json.dump(session, file)
+
+    def _get_opener(self):
+        # Shared by reconnections to keep pooled connections alive
+        if self._opener is None:
+            self._opener = RPCOpener(verify=not settings.no_verify)
+        return self._opener
+
+    def _connect(self, use_session=True):
+        # odoorpc is slow to import, only load it when connecting
+        import odoorpc  # pylint: disable=C0415
+        from odoorpc.env import Environment  # pylint: disable=C0415
+
         options = self.get_params()
         _logger.debug("Odoorpc %s with %s", self._url, options)
 
-        # urlopen error [SSL: CERTIFICATE_VERIFY_FAILED] certificate verify failed: unable to get local issuer certificate
-        # FIXME: definitely not the best solution...
-        if settings.no_verify:
-            myssl = ssl.create_default_context()
-            myssl.check_hostname = False
-            myssl.verify_mode = ssl.CERT_NONE
+        options["opener"] = self._get_opener()
 
-            opener_selfsigned = urllib.request.build_opener(
-                urllib.request.HTTPSHandler(context=myssl)
-            )
-            options["opener"] = opener_selfsigned
+        session = self._load_session() if use_session else None
+        self._from_session = bool(session)
+
+        if session:
+            # Known server version and user: no version probe nor login
+            _logger.debug("Reuse ApiX session for %s", self._user)
+            obj = odoorpc.ODOO(self._url, version=session["version"], **options)
+            obj._env = Environment(obj, self._db, session["uid"], session["context"])
+            obj._login = self._user
+            obj._password = self._password
+            return obj
 
         obj = odoorpc.ODOO(self._url, **options)
 
@@ -66,41 +195,89 @@ class Odoo(metaclass=SingletonMeta):
             obj.login(self._db, self._user, self._password)
         except odoorpc.error.RPCError as error:
             _logger.error(error)
-            obj = None
+            return None
+
+        # Before 10.0 odoorpc relies on cookies, not worth caching
+        if odoorpc.tools.v(obj.version)[0] >= 10:
+            self._save_session(obj)
 
         return obj
 
-    def get_databases(self, name, **kwargs):
+    @relogin_on_error
+    def search_read(self, model, domain, fields, **kwargs):
+        """Return plain records matching `domain` in a single RPC."""
+
+        options = {k: v for k, v in kwargs.items() if k in ["offset", "limit", "order"]}
+        options["fields"] = fields
+
+        # Bypass odoorpc model proxies: no ir.model/fields_get probes, no lazy reads
+        return self._cr.execute_kw(model, "search_read", [domain], options)
+
+    @relogin_on_error
+    def search(self, model, domain):
+        """Return ids of all records matching `domain` in a single RPC."""
+        return self._cr.execute_kw(model, "search", [domain])
+
+    def search_read_all(self, model, domain, fields, page_size=vars.RPC_PAGE_SIZE):
+        """Return all records matching `domain`, fetched page by page."""
+
+        records = []
+        offset = 0
+
+        while True:
+            page = self.search_read(
+                model, domain, fields, offset=offset, limit=page_size, order="id"
+            )
+            records += page
+            if len(page) < page_size:
+                return records
+            offset += page_size
+
+    def get_databases(self, name, fields=None, **kwargs):
         """Search on ApiX databases."""
 
         strict = kwargs.get("strict", True)
-        options = {k: v for k, v in kwargs.items() if k in ["limit"]}
+        options = {k: v for k, v in kwargs.items() if k in ["offset", "limit"]}
 
         operator = "=" if strict else "ilike"
         domain = [("name", operator, name)]
-        ids = self.saas_database.search(domain, **options)
 
-        if ids:
-            return self.saas_database.browse(ids)
-        return False
+        return self.search_read(
+            vars.SAAS_DATABASE_MODEL, domain, fields or vars.CATALOG_FIELDS, **options
+        )
+
+    def get_databases_since(self, write_date=None):
+        """Return catalog fields of databases modified since `write_date`."""
+
+        domain = [("write_date", ">=", write_date)] if write_date else []
+        return self.search_read_all(
+            vars.SAAS_DATABASE_MODEL, domain, vars.CATALOG_FIELDS
+        )
+
+    def get_database_ids(self):
+        """Return ids of all ApiX databases."""
+        return self.search(vars.SAAS_DATABASE_MODEL, [])
 
-    def get_database_by_uuid(self, uuid):
-        """Get database object by UUID."""
+    def get_database_by_uuid(self, uuid, fields=None):
+        """Get database record by UUID."""
 
         domain = [("uuid", "=", uuid)]
-        ids = self.saas_database.search(domain, limit=1)
-        if ids:
-            return self.saas_database.browse(ids)
-        return False
+        records = self.search_read(
+            vars.SAAS_DATABASE_MODEL, domain, fields or vars.CATALOG_FIELDS, limit=1
+        )
+        return records[0] if records else False
 
+    @relogin_on_error
     def get_last_backup_url(self, uuid):
         """Get last backup url from ApiX database."""
 
-        database = self.get_database_by_uuid(uuid)
+        database = self.get_database_by_uuid(uuid, fields=["id"])
 
         if not database:
             return False
 
-        action = database.action_get_last_backup()
+        action = self._cr.execute_kw(
+            vars.SAAS_DATABASE_MODEL, "action_get_last_backup", [[database["id"]]]
+        )
 
         return action.get("url", False)
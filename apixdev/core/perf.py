@@ -0,0 +1,92 @@
+import math
+import re
+from collections import defaultdict
+
+# werkzeug request line, Odoo appends query count, SQL time and remaining time:
+# ... werkzeug: 172.18.0.1 - - [date] "POST /web/... HTTP/1.1" 200 - 12 0.034 0.120
+REQUEST_PATTERN = re.compile(
+    r'"(?P<method>[A-Z]+) (?P<path>\S+) [^"]*" (?P<status>\d{3}) \S+ '
+    r"(?P<queries>\d+) (?P<sql>\d+\.\d+) (?P<other>\d+\.\d+)\s*$"
+)
+CALL_KW_PATTERN = re.compile(r"^/web/dataset/call_(?:kw|button)/(?P<model>[\w.]+)")
+ID_PATTERN = re.compile(r"/\d+(?=/|$)")
+
+
+def parse_request(message):
+    """Return timing fields of a werkzeug log line, or None."""
+
+    match = REQUEST_PATTERN.search(message)
+    if not match:
+        return None
+
+    path = match.group("path").split("?", 1)[0]
+    model = CALL_KW_PATTERN.match(path)
+    sql = float(match.group("sql"))
+
+    return {
+        "route": f"{match.group('method')} {ID_PATTERN.sub('/<id>', path)}",
+        "model": model.group("model") if model else "",
+        "status": int(match.group("status")),
+        "queries": int(match.group("queries")),
+        "sql": sql,
+        "total": sql + float(match.group("other")),
+    }
+
+
+def percentile(values, pct):
+    """Return nearest-rank percentile of sorted `values`."""
+
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+class PerfReport:
+    """Request latencies aggregated by route and model."""
+
+    def __init__(self):
+        self._samples = defaultdict(list)
+        self.count = 0
+
+    def add(self, message):
+        """Add log line, return True if it was a timed request."""
+
+        record = parse_request(message)
+        if not record:
+            return False
+
+        key = (record["route"], record["model"])
+        self._samples[key].append((record["total"], record["sql"], record["queries"]))
+        self.count += 1
+
+        return True
+
+    def get_rows(self, sort="p95", min_count=1):
+        """Return one dict per route and model, times in milliseconds."""
+
+        rows = []
+
+        for (route, model), samples in self._samples.items():
+            if len(samples) < min_count:
+                continue
+
+            totals = sorted(sample[0] for sample in samples)
+            sql = sorted(sample[1] for sample in samples)
+            queries = [sample[2] for sample in samples]
+
+            rows.append(
+                {
+                    "route": route,
+                    "model": model,
+                    "count": len(samples),
+                    "p50": round(percentile(totals, 50) * 1000, 1),
+                    "p95": round(percentile(totals, 95) * 1000, 1),
+                    "p99": round(percentile(totals, 99) * 1000, 1),
+                    "sql_p95": round(percentile(sql, 95) * 1000, 1),
+                    "queries_avg": round(sum(queries) / len(queries), 1),
+                    "queries_max": max(queries),
+                }
+            )
+
+        return sorted(rows, key=lambda row: row[sort], reverse=sort != "route")
@@ -1,17 +1,23 @@
+import hashlib
+import json
 import logging
 import os
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from shutil import rmtree
 
-import requests
-from requests.exceptions import HTTPError
-
+from apixdev.core.cache import GitCache
 from apixdev.core.compose import Compose
 from apixdev.core.docker import Stack
 from apixdev.core.exceptions import DownloadError
+from apixdev.core.git import get_changed_files, ls_remotes, rev_parse
+from apixdev.core.images import Images
+from apixdev.core.modules import ModuleIndex
+from apixdev.core.registry import Registry
 from apixdev.core.settings import settings, vars
 from apixdev.core.tools import (
     filter_requirements,
+    get_http_session,
     get_requirements_from_path,
     list_to_text,
     text_to_list,
@@ -72,6 +78,31 @@ class Project:
 
         return os.path.join(self.path, ".env")
 
+    @property
+    def modules_file(self):
+        """Complete filepath to Odoo modules index."""
+
+        return os.path.join(self.path, ".apix", "modules.json")
+
+    @property
+    def state_file(self):
+        """Complete filepath to apix state file."""
+
+        return os.path.join(self.path, ".apix", "state.json")
+
+    @property
+    def backup_file(self):
+        """Complete filepath to downloaded backup."""
+
+        return os.path.join(self.path, ".apix", "backup")
+
+    @property
+    def pg_user(self):
+        """PostgreSQL user of the stack."""
+
+        compose = Compose.from_path(self.compose_file)
+        return compose.extract("services/pg/environment/POSTGRES_USER") or None
+
     @property
     def repositories_path(self):
         """Complete path to repositories."""
@@ -92,69 +123,417 @@ class Project:
     def _get_manifest(self):
         return Compose.from_path(self.manifest_file)
 
-    def download(self, filename, url, force=False):
-        """Generic method to download file from ApiX database."""
+    def read_state(self, key):
+        """Read section from project state file."""
+
+        if not os.path.exists(self.state_file):
+            return {}
+
+        with open(self.state_file, encoding="utf8") as file:
+            return json.load(file).get(key, {})
+
+    def write_state(self, key, vals):
+        """Write section to project state file."""
+
+        state = {}
+        if os.path.exists(self.state_file):
+            with open(self.state_file, encoding="utf8") as file:
+                state = json.load(file)
+
+        state[key] = vals
+        os.makedirs(os.path.dirname(self.state_file), exist_ok=True)
+
+        tmp_file = f"{self.state_file}.tmp"
+        with open(tmp_file, "w", encoding="utf8") as file:
+            json.dump(state, file, indent=2, sort_keys=True)
+        os.replace(tmp_file, self.state_file)
+
+    def _fetch(self, filename, url, cached=None):
+        """Stream url to filename, return validators of the downloaded file.
+
+        With `cached` validators from a previous download of the same url,
+        the request is conditional and `cached` is returned if not modified.
+        """
+        from requests.exceptions import RequestException  # pylint: disable=C0415
 
         filepath = os.path.join(self.path, filename)
         headers = {
             "X-Api-Token": settings.get_var("apix.token"),
         }
 
-        if force and os.path.exists(filepath):
-            _logger.debug("Remove %s file", filepath)
-            os.remove(filepath)
+        if cached and cached.get("url") == url and os.path.exists(filepath):
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
 
         try:
-            response = requests.get(
+            with get_http_session().get(
                 url,
                 headers=headers,
                 allow_redirects=False,
                 timeout=vars.DEFAULT_TIMEOUT,
-            )
-            response.raise_for_status()
-        except HTTPError as error:
-            code = error.response.status_code
+                stream=True,
+            ) as response:
+                response.raise_for_status()
+
+                if response.status_code == 304:
+                    _logger.debug("%s not modified", filename)
+                    return cached
+
+                tmp_filepath = f"{filepath}.part"
+                with open(tmp_filepath, "wb") as file:
+                    for chunk in response.iter_content(vars.DOWNLOAD_CHUNK_SIZE):
+                        file.write(chunk)
+                os.replace(tmp_filepath, filepath)
+
+                return {
+                    "url": url,
+                    "etag": response.headers.get("ETag"),
+                    "last_modified": response.headers.get("Last-Modified"),
+                }
+        except RequestException as error:
+            code = getattr(error.response, "status_code", type(error).__name__)
             raise DownloadError(filename, url, code) from error
 
-        with open(filepath, "wb") as file:
-            file.write(response.content)
+    def download_all(self, files, force=False):
+        """Download files concurrently from ApiX database.
+
+        `files` is a list of (filename, url), unchanged files are not
+        downloaded again unless `force` is set.
+        Return ({filename: True if downloaded}, [DownloadError]), a failed
+        download does not prevent the others from being written.
+        """
+
+        state = self.read_state("downloads")
+        results = {}
+        errors = []
+
+        def fetch(item):
+            filename, url = item
+            cached = None if force else state.get(filename)
+            return self._fetch(filename, url, cached)
+
+        with ThreadPoolExecutor(max_workers=len(files) or 1) as executor:
+            futures = {executor.submit(fetch, item): item[0] for item in files}
+            for future in as_completed(futures):
+                filename = futures[future]
+                try:
+                    vals = future.result()
+                except DownloadError as error:
+                    errors.append(error)
+                    continue
+                results[filename] = vals is not state.get(filename)
+                state[filename] = vals
+
+        self.write_state("downloads", state)
+        Registry.from_path(self.root_path).register(self.name, self.path)
+
+        return results, errors
 
-        return True
+    def download(self, filename, url, force=False):
+        """Generic method to download file from ApiX database."""
 
-    def pull_repositories(self):
-        """Recursively pull code repositories"""
-        if not self.repositories_file:
-            return False
+        results, errors = self.download_all([(filename, url)], force)
+        if errors:
+            raise errors[0]
+
+        return results[filename]
 
-        env_file = self.env_file if os.path.exists(self.env_file) else settings.env_file
+    def get_repositories(self):
+        """Return repositories directories declared in repositories.yaml."""
 
-        args = [
-            "gitaggregate",
-            "-c",
-            "repositories.yaml",
-            "--expand-env",
-            "--env-file",
-            env_file,
+        compose = Compose.from_path(self.repositories_file)
+
+        return [
+            os.path.normpath(os.path.join(self.path, directory))
+            for directory in compose._content.keys()
         ]
-        subprocess.call(args, cwd=self.path)
 
-        return True
+    def _get_env_file(self):
+        return self.env_file if os.path.exists(self.env_file) else settings.env_file
+
+    def _load_repositories_config(self):
+        """Return dict {repository path: (merge spec, git-aggregator config)}."""
+        from git_aggregator.config import load_config  # pylint: disable=C0415
+
+        compose = Compose.from_path(self.repositories_file)
+        # Same order as repositories.yaml, with environment variables expanded
+        repos = load_config(self.repositories_file, True, self._get_env_file())
+
+        return dict(zip(self.get_repositories(), zip(compose._content.values(), repos)))
+
+    def _get_repositories_refs(self, repos, jobs):
+        """Return merge spec hash and resolved remote refs for each repository."""
+
+        merges_by_path = {}
+        refs_by_url = {}
+
+        for path, (_, repo) in repos.items():
+            urls = {remote["name"]: remote["url"] for remote in repo["remotes"]}
+            merges = [(merge, urls.get(merge["remote"])) for merge in repo["merges"]]
+            for merge, url in merges:
+                refs_by_url.setdefault(url, set()).add(merge["ref"])
+            merges_by_path[path] = merges
+
+        resolved = ls_remotes(refs_by_url, jobs)
+        res = {}
+
+        for path, (spec, _) in repos.items():
+            merges = merges_by_path[path]
+            spec = json.dumps(spec, sort_keys=True, default=str)
+            res[path] = {
+                "spec": hashlib.sha256(spec.encode("utf8")).hexdigest(),
+                "refs": {
+                    f"{merge['remote']} {merge['ref']}": resolved[url][merge["ref"]]
+                    for merge, url in merges
+                },
+            }
+
+        return res
+
+    def _aggregate_repository(self, path, urls=None):
+        res = {
+            "name": os.path.basename(path),
+            "path": path,
+            "success": False,
+            "skipped": False,
+            "output": "",
+        }
+
+        try:
+            env_file = self._get_env_file()
+
+            is_new = not os.path.exists(path) or not os.listdir(path)
+            if is_new and urls and settings.git_cache:
+                # Borrow objects from shared mirrors, only missing ones are fetched
+                GitCache.from_path().link(path, urls)
+
+            args = [
+                "gitaggregate",
+                "-c",
+                "repositories.yaml",
+                "--expand-env",
+                "--env-file",
+                env_file,
+                "-d",
+                path,
+            ]
+            process = subprocess.run(
+                args,
+                cwd=self.path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                check=False,
+            )
+        except Exception as error:  # pylint: disable=W0703
+            # One broken repository must not abort the others
+            _logger.debug("Aggregate %s", path, exc_info=True)
+            res["output"] = str(error) or error.__class__.__name__
+            return res
+
+        res["success"] = process.returncode == 0
+        res["output"] = process.stdout.decode("utf8", errors="replace")
+        return res
+
+    @staticmethod
+    def _get_cache_urls(repo):
+        """Return remote urls to mirror in the git cache, none if shallow.
+
+        A shallow clone only fetches part of the history, a full mirror
+        would cost more than the clone it is meant to speed up.
+        """
 
-    def merge_requirements(self):
-        """Merge all requirements from manifest and repositories."""
+        options = [repo.get("defaults", {}), *repo["merges"]]
+        if any(key in vals for vals in options for key in vars.GIT_SHALLOW_OPTIONS):
+            return []
+
+        return [remote["url"] for remote in repo["remotes"]]
+
+    @staticmethod
+    def _is_repository_unchanged(path, previous, current):
+        if not previous or not os.path.isdir(os.path.join(path, ".git")):
+            return False
+        if None in current["refs"].values():
+            # Remote not reachable, unable to tell
+            return False
+        return previous == current
+
+    def pull_repositories(self, jobs=None, callback=None, force=False):
+        """Pull code repositories, `jobs` repositories at a time.
+
+        Repositories whose merge spec and remote refs did not change since
+        the last successful pull are skipped, unless `force` is set.
+
+        `callback` is called with each repository result as soon as
+        it is aggregated, results are returned in repositories.yaml order.
+        """
+        if not os.path.exists(self.repositories_file):
+            return []
+
+        jobs = jobs or settings.jobs
+        repos = self._load_repositories_config()
+        repositories = list(repos.keys())
+        current = self._get_repositories_refs(repos, jobs)
+        results = {}
+
+        def relpath(path):
+            return os.path.relpath(path, self.path)
+
+        # Forget repositories removed from repositories.yaml
+        state = {
+            key: vals
+            for key, vals in self.read_state("repositories").items()
+            if key in map(relpath, repositories)
+        }
+
+        def done(res):
+            results[res["path"]] = res
+            _logger.debug("Aggregate %s: %s", res["name"], res["success"])
+
+            if res["success"]:
+                state[relpath(res["path"])] = current[res["path"]]
+            if callback:
+                callback(res)
+
+        to_aggregate = []
+        for path in repositories:
+            previous = state.get(relpath(path))
+            if not force and self._is_repository_unchanged(
+                path, previous, current[path]
+            ):
+                done(
+                    {
+                        "name": os.path.basename(path),
+                        "path": path,
+                        "success": True,
+                        "skipped": True,
+                        "output": "",
+                    }
+                )
+            else:
+                to_aggregate.append(path)
+
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(
+                    self._aggregate_repository,
+                    path,
+                    self._get_cache_urls(repos[path][1]),
+                )
+                for path in to_aggregate
+            ]
+            for future in as_completed(futures):
+                done(future.result())
+
+        self.write_state("repositories", state)
+
+        return [results[path] for path in repositories]
+
+    def merge_requirements(self, lock=None, **kwargs):
+        """Merge all requirements from manifest and repositories.
+
+        Environment markers are evaluated for `python_version` (default
+        from settings). With `lock`, requirements are pinned to exact
+        versions found on `index_url` or `wheel_dir`, RequirementsConflict
+        is raised before anything is written if some can not be pinned.
+        A locked project stays locked unless `lock` is False, options not
+        given are those of the previous lock.
+
+        Return dict with added and removed requirements, docker-compose.yaml
+        is left untouched when nothing changed.
+        """
 
         compose = Compose.from_path(self.compose_file)
 
-        requirements = get_requirements_from_path(self.repositories_path)
-        requirements += text_to_list(
-            compose.extract("services/odoo/environment/CUSTOM_REQUIREMENTS")
+        index = self.read_state("requirements")
+        requirements = get_requirements_from_path(self.repositories_path, index)
+        self.write_state("requirements", index)
+
+        current = text_to_list(
+            compose.extract("services/odoo/environment/CUSTOM_REQUIREMENTS") or ""
         )
-        requirements = filter_requirements(requirements)
+        previous_lock = self.read_state("lock")
+
+        # Pins written by a previous lock stand for the requirements they came from
+        if previous_lock and current == previous_lock["pins"]:
+            sources = previous_lock["requirements"]
+        else:
+            sources = current
+
+        if lock is None:
+            lock = bool(previous_lock)
+        options = {key: kwargs.get(key) for key in vars.LOCK_OPTIONS}
+        if lock and previous_lock:
+            options = {
+                key: value or previous_lock.get("options", {}).get(key)
+                for key, value in options.items()
+            }
+
+        python_version = options["python_version"] or settings.python_version
+        requirements = filter_requirements(requirements + sources, python_version)
+
+        if lock:
+            from apixdev.core.lock import RequirementsLocker  # pylint: disable=C0415
+
+            locker = RequirementsLocker(
+                options["index_url"],
+                options["wheel_dir"],
+                python_version=python_version,
+            )
+            pins = locker.lock(requirements)
+            self.write_state(
+                "lock",
+                {"requirements": requirements, "pins": pins, "options": options},
+            )
+            requirements = pins
+        elif previous_lock:
+            self.write_state("lock", {})
 
         text = list_to_text(requirements)
         compose.update("services/odoo/environment/CUSTOM_REQUIREMENTS", text)
         compose.save(self.compose_file)
 
+        return {
+            "added": sorted(set(requirements) - set(current)),
+            "removed": sorted(set(current) - set(requirements)),
+        }
+
+    def bake(self, force=False):
+        """Build project image with merged requirements preinstalled.
+
+        The image is tagged with a hash of the base image and requirements,
+        and only built when that hash changed (or with `force`).
+        Return (image tag, built) or (False, False) if the build failed.
+        """
+
+        compose = Compose.from_path(self.compose_file)
+        image = compose.extract("services/odoo/image")
+        state = self.read_state("bake")
+
+        # Compose already uses a baked image, bake again from its base
+        if state and image == state.get("image"):
+            image = state["base_image"]
+
+        requirements = text_to_list(
+            compose.extract("services/odoo/environment/CUSTOM_REQUIREMENTS") or ""
+        )
+        content = json.dumps([image, requirements])
+        digest = hashlib.sha256(content.encode("utf8")).hexdigest()[:12]
+        tag = f"{vars.BAKE_REPOSITORY}/{self.get_stack().project_name}:{digest}"
+
+        built = False
+        if force or not Images.inspect(tag):
+            if not Images.build(tag, image, requirements):
+                return False, False
+            built = True
+
+        compose.update("services/odoo/image", tag)
+        compose.save(self.compose_file)
+        self.write_state("bake", {"base_image": image, "image": tag})
+
+        return tag, built
+
     def read_manifest(self):
         """Read YAML manifest."""
 
@@ -162,25 +541,84 @@ class Project:
         self.uuid = manifest.extract("uuid")
         self.major_version = manifest.extract("major_version")
 
-    def load_manifest(self):
-        """Load YAML manifest and download files related."""
+    def load_manifest(self, force=False):
+        """Load YAML manifest and download files related.
+
+        Files are only downloaded again if they changed on ApiX,
+        return the same values as `download_all`.
+        """
 
         manifest = self._get_manifest()
 
         keys = [
-            (self.compose_file, "docker_compose_url"),
-            (self.repositories_file, "repositories_url"),
+            ("docker-compose.yaml", "docker_compose_url"),
+            ("repositories.yaml", "repositories_url"),
         ]
+        files = [(filename, manifest.extract(key)) for filename, key in keys]
 
-        for filename, key in keys:
-            url = manifest.extract(key)
-            self.download(filename, url, True)
+        return self.download_all(files, force)
 
     def get_stack(self):
         """Return Stack object."""
 
         return Stack(self.name, self.path)
 
+    def get_module_index(self):
+        """Return up to date index of Odoo modules in repositories."""
+
+        return ModuleIndex.from_project(self)
+
+    def get_repositories_heads(self):
+        """Return {repository relative path: HEAD sha}."""
+
+        return {
+            os.path.relpath(path, self.path): rev_parse(path)
+            for path in self.get_repositories()
+        }
+
+    def get_changed_modules(self, database):
+        """Return modules to update on `database` and repositories heads.
+
+        Modules are those whose files changed since the last recorded
+        update of `database`, plus their dependents, as {module: reason}.
+        Modules are None if no update of `database` was recorded.
+        """
+
+        heads = self.get_repositories_heads()
+        previous = self.read_state("module_updates").get(database)
+
+        if previous is None:
+            return None, heads
+
+        index = self.get_module_index()
+        reasons = {}
+
+        for key, head in heads.items():
+            path = os.path.join(self.path, key)
+            relpath = os.path.relpath(path, self.repositories_path)
+            since = previous.get(key)
+            files = get_changed_files(path, since) if since and head else None
+
+            if files is None:
+                # New repository or unknown previous commit: all its modules
+                reason = "unknown previous commit" if since else "new repository"
+                changed = dict.fromkeys(index.get_modules_in(relpath), reason)
+            else:
+                files = [os.path.join(relpath, filepath) for filepath in files]
+                changed = index.get_changed_modules(files)
+
+            for name, reason in changed.items():
+                reasons.setdefault(name, reason)
+
+        return index.add_dependents(reasons), heads
+
+    def record_module_update(self, database, heads):
+        """Record repositories heads of a successful update of `database`."""
+
+        state = self.read_state("module_updates")
+        state[database] = heads
+        self.write_state("module_updates", state)
+
     def get_repo(self):
         """Return repositories and branches from YAML manifest."""
 
@@ -197,6 +635,7 @@ class Project:
         """Delete project and remove files."""
 
         rmtree(self.path, ignore_errors=True)
+        Registry.from_path(self.root_path).unregister(self.name)
         self.root_path = None
         self.path = None
         self.name = None
@@ -1,24 +1,157 @@
-import os
+import fnmatch
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
+from apixdev.core.docker import Stack
+from apixdev.core.exceptions import RequirementsConflict
 from apixdev.core.project import Project
+from apixdev.core.registry import Registry
 from apixdev.core.settings import settings
 
+_logger = logging.getLogger(__name__)
+
+
+def _stop(project, **kwargs):  # pylint: disable=W0613
+    if not project.get_stack().stop(quiet=True):
+        return False, "docker compose down failed"
+    return True, "stopped"
+
+
+def _pull(project, force=False, **kwargs):  # pylint: disable=W0613
+    # One repository at a time per project, parallelism is between projects
+    results = project.pull_repositories(jobs=1, force=force)
+    failures = [res["name"] for res in results if not res["success"]]
+    skipped = [res for res in results if res["skipped"]]
+
+    if failures:
+        return False, f"failed: {', '.join(failures)}"
+    return True, f"{len(results)} repositories ({len(skipped)} unchanged)"
+
+
+def _merge(project, **kwargs):  # pylint: disable=W0613
+    try:
+        changes = project.merge_requirements()
+    except RequirementsConflict as error:
+        return False, str(error).splitlines()[0]
+
+    return True, f"+{len(changes['added'])} -{len(changes['removed'])} requirements"
+
+
+def _update(project, force=False, **kwargs):
+    _, errors = project.load_manifest(force)
+    if errors:
+        return False, str(errors[0])
+
+    success, message = _pull(project, force, **kwargs)
+    if not success:
+        return success, message
+
+    return _merge(project, **kwargs)
+
+
+def _status(project, **kwargs):  # pylint: disable=W0613
+    containers = project.get_stack().get_containers()
+    if not containers:
+        return True, "down"
+    return True, f"up ({len(containers)} containers)"
+
+
+OPERATIONS = {
+    "stop": _stop,
+    "pull": _pull,
+    "merge": _merge,
+    "update": _update,
+    "status": _status,
+}
+
 
 class Projects:
     def __init__(self, path):
         self.path = path
 
     @classmethod
-    def from_path(cls, path=None):
-        """Return Projects object from path."""
+    def from_path(cls, path=None, patterns=None):
+        """Return Projects object from path.
+
+        `patterns` are glob patterns on project names, all projects if empty.
+        """
         if not path:
             path = settings.workdir
         instance = cls(path)
-        return instance.get_all()
+        return instance.get_all(patterns)
 
-    def get_all(self):
+    def get_all(self, patterns=None):
         """Return all projects find in workdir path."""
-        projects = list(map(Project, os.listdir(self.path)))
-        projects = list(filter(lambda project: project.is_ready, projects))
+        entries = self.get_entries(patterns)
+        return [Project(entry["name"], entry["path"]) for entry in entries]
+
+    def get_entries(self, patterns=None, major_version=None, running=False):
+        """Return registry entries of ready projects, manifests are not read.
+
+        `patterns` are glob patterns on names, `major_version` keeps projects
+        of this Odoo version and `running` those with running containers.
+        """
+        entries = Registry.from_path(self.path).refresh()
+
+        if patterns:
+            entries = [
+                entry
+                for entry in entries
+                if any(fnmatch.fnmatchcase(entry["name"], item) for item in patterns)
+            ]
+
+        if major_version:
+            entries = [
+                entry
+                for entry in entries
+                if str(entry["major_version"]) == str(major_version)
+            ]
+
+        if running:
+            names = Stack.get_running_projects()
+            entries = [
+                entry
+                for entry in entries
+                if Stack(entry["name"], entry["path"]).project_name in names
+            ]
+
+        return entries
+
+    @staticmethod
+    def run(projects, operation, jobs=None, callback=None, **kwargs):
+        """Run `operation` on `projects`, `jobs` projects at a time.
+
+        `operation` is one of OPERATIONS keys, `callback` is called with
+        each project result as soon as it is done, results are returned
+        in `projects` order.
+        """
+        func = OPERATIONS[operation]
+        results = {}
+
+        def execute(project):
+            start = time.monotonic()
+            try:
+                success, message = func(project, **kwargs)
+            except Exception as error:  # pylint: disable=W0703
+                # One broken project must not abort the others
+                _logger.debug("%s %s", operation, project.name, exc_info=True)
+                success, message = False, str(error) or error.__class__.__name__
+
+            return {
+                "name": project.name,
+                "success": success,
+                "message": message,
+                "seconds": time.monotonic() - start,
+            }
+
+        with ThreadPoolExecutor(max_workers=jobs or settings.jobs) as executor:
+            futures = [executor.submit(execute, project) for project in projects]
+
+            for future in as_completed(futures):
+                res = future.result()
+                results[res["name"]] = res
+                if callback:
+                    callback(res)
 
-        return projects
+        return [results[project.name] for project in projects]
@@ -0,0 +1,154 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+
+from apixdev.core.compose import Compose
+from apixdev.core.settings import settings, vars
+
+_logger = logging.getLogger(__name__)
+
+PROJECT_FILES = ["manifest.yaml", "docker-compose.yaml", "repositories.yaml"]
+
+
+class Registry:
+    """Index of workdir projects.
+
+    Each entry stores name, uuid, major_version, path and the manifest
+    mtime, manifests are only parsed again when their mtime changed.
+    Updates re-read the file under a lock, projects are registered from
+    several threads at once.
+    """
+
+    _lock = threading.RLock()
+
+    def __init__(self, workdir, filepath):
+        self.workdir = workdir
+        self.filepath = filepath
+        self._entries = None
+
+    @classmethod
+    def from_path(cls, path=None):
+        """Return Registry object of workdir `path` (default from settings)."""
+        if not path:
+            path = settings.workdir
+        return cls(path, os.path.join(path, ".apix", vars.REGISTRY_FILE))
+
+    @property
+    def entries(self):
+        """Registered entries by project name, as last saved."""
+        if self._entries is None:
+            self._entries = self._read()
+        return self._entries
+
+    def _read(self):
+        try:
+            with open(self.filepath, encoding="utf8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        """Write registry file atomically."""
+
+        dirname = os.path.dirname(self.filepath)
+        os.makedirs(dirname, exist_ok=True)
+
+        # Unique temporary file, other processes may save at the same time
+        fd, tmp_file = tempfile.mkstemp(dir=dirname, suffix=".tmp")
+        try:
+            with open(fd, "w", encoding="utf8") as file:
+                json.dump(self.entries, file, indent=2, sort_keys=True)
+            os.replace(tmp_file, self.filepath)
+        except BaseException:
+            os.unlink(tmp_file)
+            raise
+
+    def reload(self):
+        """Read entries again from registry file."""
+        self._entries = self._read()
+
+    def _stat(self, path):  # pylint: disable=R0201
+        """Return manifest mtime if `path` holds a ready project, else None."""
+        try:
+            stats = [os.stat(os.path.join(path, name)) for name in PROJECT_FILES]
+        except OSError:
+            return None
+        return stats[0].st_mtime
+
+    def _make_entry(self, name, path, mtime):  # pylint: disable=R0201
+        manifest = Compose.from_path(os.path.join(path, "manifest.yaml"))
+        return {
+            "name": name,
+            "uuid": manifest.extract("uuid"),
+            "major_version": manifest.extract("major_version"),
+            "path": path,
+            "mtime": mtime,
+        }
+
+    def register(self, name, path=None, save=True):
+        """Add or update project entry, remove it if project is not ready."""
+
+        path = path or os.path.join(self.workdir, name)
+        mtime = self._stat(path)
+        entry = self._make_entry(name, path, mtime) if mtime is not None else None
+
+        with self._lock:
+            if save:
+                self.reload()
+
+            if entry is None:
+                self.entries.pop(name, None)
+            else:
+                self.entries[name] = entry
+
+            if save:
+                self.save()
+
+    def unregister(self, name):
+        """Remove project entry."""
+
+        with self._lock:
+            self.reload()
+            if self.entries.pop(name, None) is not None:
+                self.save()
+
+    def refresh(self):
+        """Revalidate entries against workdir, return them sorted by name.
+
+        Only a few stat calls per project, manifests are parsed for new
+        or modified projects only.
+        """
+
+        with self._lock:
+            self.reload()
+            changed = False
+            names = set()
+
+            with os.scandir(self.workdir) as it:
+                for entry in it:
+                    if entry.name.startswith(".") or not entry.is_dir():
+                        continue
+
+                    mtime = self._stat(entry.path)
+                    if mtime is None:
+                        continue
+
+                    names.add(entry.name)
+                    previous = self.entries.get(entry.name)
+                    if previous and previous["mtime"] == mtime:
+                        continue
+
+                    _logger.debug("Register %s", entry.name)
+                    self.register(entry.name, entry.path, save=False)
+                    changed = True
+
+            for name in set(self.entries) - names:
+                del self.entries[name]
+                changed = True
+
+            if changed:
+                self.save()
+
+            return [self.entries[name] for name in sorted(self.entries)]
@@ -12,11 +12,9 @@ from apixdev.core.tools import (
     unmerge_sections,
 )
 
+# Created on first load by Settings, not at import time
 config_dir = os.path.join(vars.HOME_PATH, vars.CONFIG_PATH)
 
-if not os.path.isdir(config_dir):
-    os.makedirs(config_dir)
-
 logging.basicConfig(level=vars.LOGGING_LEVEL)
 
 _logger = logging.getLogger(__name__)
@@ -65,11 +63,50 @@ class Settings(metaclass=SingletonMeta):
         """Workdir path property."""
         return self.get_var("local.workdir")
 
+    @property
+    def catalog_file(self):
+        """Local ApiX databases catalog filepath."""
+        return os.path.join(self._path, vars.CATALOG_FILE)
+
+    @property
+    def session_file(self):
+        """ApiX session cache filepath."""
+        return os.path.join(self._path, vars.SESSION_FILE)
+
     @property
     def env_file(self):
         """ENV file property."""
         return os.path.join(self._path, ".env")
 
+    @property
+    def jobs(self):
+        """Default number of parallel jobs."""
+        return self._config.getint("local", "jobs", fallback=vars.DEFAULT_JOBS)
+
+    @property
+    def git_cache(self):
+        """Use shared git cache for repositories."""
+        return self._config.getboolean(
+            "local", "git_cache", fallback=vars.DEFAULT_GIT_CACHE
+        )
+
+    @property
+    def pip_index(self):
+        """Package index used to lock requirements."""
+        return self._config.get("local", "pip_index", fallback=vars.DEFAULT_PIP_INDEX)
+
+    @property
+    def wheel_dir(self):
+        """Local wheels directory used to lock requirements."""
+        return self._config.get("local", "wheel_dir", fallback="")
+
+    @property
+    def python_version(self):
+        """Python version of Odoo images, used to lock requirements."""
+        return self._config.get(
+            "local", "python_version", fallback=vars.DEFAULT_PYTHON_VERSION
+        )
+
     @property
     def no_verify(self):
         """No verify property."""
@@ -82,6 +119,8 @@ class Settings(metaclass=SingletonMeta):
             "apix.timeout": vars.DEFAULT_TIMEOUT,
             "apix.no_verify": vars.DEFAULT_NO_VERIFY,
             "local.default_password": vars.DEFAULT_PASSWORD,
+            "local.jobs": vars.DEFAULT_JOBS,
+            "local.git_cache": vars.DEFAULT_GIT_CACHE,
         }
 
     def _prepare_config(self):  # pylint: disable=R0201
@@ -2,10 +2,10 @@ import json
 import logging
 import os
 import subprocess
+from functools import lru_cache
 
-import pandas
-import requirements as req_tool
-from packaging.specifiers import SpecifierSet
+import apixdev.vars as vars
+from apixdev.core.exceptions import RequirementsConflict
 
 _logger = logging.getLogger(__name__)
 
@@ -16,15 +16,11 @@ def dict_to_string(vals):
     return ", ".join([f"{key}: {value}" for key, value in vals.items()])
 
 
-def dict_to_dataframe(vals):
-    """Return Pandas dataframe from dict."""
-    dataframe = pandas.DataFrame(vals)
-
-    return dataframe
-
-
 def run_external_command(cmd, **kwargs):
-    """Run system command and return result."""
+    """Run system command and return result.
+
+    With `result=False` output is not captured, return True on success.
+    """
 
     result = kwargs.pop("result", True)
 
@@ -35,8 +31,7 @@ def run_external_command(cmd, **kwargs):
         if result:
             res = subprocess.check_output(cmd, **kwargs)
         else:
-            subprocess.call(cmd, **kwargs)
-            res = True
+            res = subprocess.call(cmd, **kwargs) == 0
     except FileNotFoundError as error:
         _logger.error(error)
         return False
@@ -44,6 +39,63 @@ def run_external_command(cmd, **kwargs):
     return res
 
 
+@lru_cache(maxsize=None)
+def get_http_session():
+    """Return HTTP session shared by all downloads (connection pooling)."""
+    import requests  # pylint: disable=C0415
+
+    return requests.Session()
+
+
+def stream_external_command(cmd, **kwargs):
+    """Run system command and yield its stdout line by line."""
+
+    if isinstance(cmd, str):
+        cmd = cmd.split(" ")
+
+    try:
+        process = subprocess.Popen(  # pylint: disable=R1732
+            cmd, stdout=subprocess.PIPE, **kwargs
+        )
+    except FileNotFoundError as error:
+        _logger.error(error)
+        return
+
+    with process:
+        yield from process.stdout
+
+
+def iter_json_lines(lines):
+    """Incrementally decode JSON lines, one record at a time.
+
+    Docker prints one JSON object per line with `--format json`, older
+    `docker compose ps` versions print a single JSON array instead.
+    """
+
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf8")
+        line = line.strip()
+        if not line:
+            continue
+
+        data = json.loads(line)
+        if isinstance(data, list):
+            yield from data
+        else:
+            yield data
+
+
+def iter_docker_records(cmd, parser=None, **kwargs):
+    """Run docker command with JSON output and yield parsed records."""
+
+    records = iter_json_lines(stream_external_command(cmd, **kwargs))
+    if parser is None:
+        yield from records
+    else:
+        yield from map(parser, records)
+
+
 def text_to_list(data):
     """Transform string to list."""
 
@@ -59,42 +111,227 @@ def list_to_text(items, separator="\n\n", default=""):
 
 
 def deduplicate(items):
-    """Deduplicate items."""
+    """Deduplicate items, sorted to keep output stable."""
+
+    return sorted(set(items))
 
-    return list(set(items))
 
+def find_files(path, filename, max_depth=vars.SCAN_MAX_DEPTH, prune=False):
+    """Yield entries named `filename` under path, up to `max_depth` levels.
+
+    Hidden directories (.git, ...) and vars.SCAN_IGNORED_DIRS are not visited,
+    with `prune` neither are subdirectories of a directory holding `filename`.
+    """
+
+    stack = [(path, 0)]
+
+    while stack:
+        current, depth = stack.pop()
+        subdirs = []
+        found = False
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            continue
+
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if (
+                        depth < max_depth
+                        and not entry.name.startswith(".")
+                        and entry.name not in vars.SCAN_IGNORED_DIRS
+                    ):
+                        subdirs.append((entry.path, depth + 1))
+                elif entry.name == filename:
+                    found = True
+                    yield entry
 
-def get_requirements_from_path(path):
-    """Recursively extract all requirements from root path"""
+        if not (prune and found):
+            stack += subdirs
+
+
+def get_requirements_from_path(path, index=None):
+    """Extract all requirements from root path.
+
+    `index` is a dict {relative filepath: {mtime, size, lines}} updated in place,
+    only files whose mtime or size changed since are read again.
+    """
 
     requirements = []
+    found = set()
 
-    for root, _, files in os.walk(path):
-        for file in files:
-            if file == "requirements.txt":
-                with open(os.path.join(root, file), encoding="utf8") as tmp:
-                    requirements += tmp.readlines()
+    for entry in find_files(path, vars.REQUIREMENTS_FILE):
+        key = os.path.relpath(entry.path, path)
+        stat = entry.stat()
+        cached = index.get(key) if index is not None else None
+        found.add(key)
+
+        if (
+            cached
+            and cached["mtime"] == stat.st_mtime_ns
+            and cached["size"] == stat.st_size
+        ):
+            requirements += cached["lines"]
+            continue
+
+        with open(entry.path, encoding="utf8") as tmp:
+            lines = text_to_list(tmp.read())
+
+        if index is not None:
+            index[key] = {
+                "mtime": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "lines": lines,
+            }
+        requirements += lines
 
-    requirements = list({e.strip() for e in requirements})
+    if index is not None:
+        for key in set(index) - found:
+            del index[key]
+
+    requirements = deduplicate(requirements)
     _logger.debug("Read requirements from path: %s", requirements)
 
     return requirements
 
 
-def filter_requirements(items):
-    """Cleans and eliminates duplicate requirements"""
+def _get_bounds(spec):
+    """Return (lower, upper) bounds of a specifier, as (version, inclusive).
+
+    Bounds are None when unknown or unbounded, exclusions and arbitrary
+    equality are not bounds.
+    """
+    from packaging.version import InvalidVersion, Version  # pylint: disable=C0415
+
+    if spec.operator == "===" or spec.operator == "!=":
+        return None, None
+
+    try:
+        version = Version(spec.version.rstrip(".*"))
+    except InvalidVersion:
+        return None, None
+
+    if spec.operator == "==" and spec.version.endswith(".*"):
+        # ==1.4.* is >=1.4.dev0, <1.5.dev0
+        release = version.release
+        upper = ".".join(map(str, release[:-1] + (release[-1] + 1,)))
+        return (Version(f"{version}.dev0"), True), (Version(f"{upper}.dev0"), False)
+    if spec.operator == "==":
+        return (version, True), (version, True)
+    if spec.operator in (">=", ">"):
+        return (version, spec.operator == ">="), None
+    if spec.operator in ("<=", "<"):
+        return None, (version, spec.operator == "<=")
+    if spec.operator == "~=":
+        # ~=1.4.5 is >=1.4.5, ==1.4.*
+        release = version.release[:-1]
+        upper = Version(".".join(map(str, release[:-1] + (release[-1] + 1,))))
+        return (version, True), (upper, False)
+
+    return None, None
+
+
+def is_empty_specifier(specifier):
+    """Check if no version can match all specifiers of `specifier`."""
+
+    lower = upper = None
+
+    for spec in specifier:
+        spec_lower, spec_upper = _get_bounds(spec)
+
+        # Highest lower bound, exclusive first on equal versions
+        if spec_lower and (not lower or spec_lower[0] > lower[0]):
+            lower = spec_lower
+        elif spec_lower and spec_lower[0] == lower[0] and not spec_lower[1]:
+            lower = spec_lower
+
+        # Lowest upper bound, exclusive first on equal versions
+        if spec_upper and (not upper or spec_upper[0] < upper[0]):
+            upper = spec_upper
+        elif spec_upper and spec_upper[0] == upper[0] and not spec_upper[1]:
+            upper = spec_upper
+
+    if not lower or not upper:
+        return False
+    if lower[0] != upper[0]:
+        return lower[0] > upper[0]
+
+    # A single version left, still excluded by an exclusive bound or !=
+    return not (
+        lower[1] and upper[1] and specifier.contains(lower[0], prereleases=True)
+    )
+
+
+def get_marker_environment(python_version):
+    """Return environment markers values of an Odoo image running `python_version`."""
+
+    release = python_version.split(".")
+    full_version = ".".join((release + ["0", "0"])[:3])
+
+    return {
+        "python_version": ".".join(release[:2]),
+        "python_full_version": full_version,
+        "implementation_version": full_version,
+        "implementation_name": "cpython",
+        "platform_python_implementation": "CPython",
+        "os_name": "posix",
+        "sys_platform": "linux",
+        "platform_system": "Linux",
+    }
+
+
+def match_marker(line, environment):
+    """Check if environment marker of requirement `line` matches `environment`.
+
+    Requirements without marker, or with an invalid one, always match.
+    """
+    from packaging.markers import InvalidMarker, Marker  # pylint: disable=C0415
+
+    _, sep, marker = line.partition(";")
+    if not sep or not marker.strip():
+        return True
+
+    try:
+        return Marker(marker.strip()).evaluate(environment)
+    except InvalidMarker:
+        _logger.debug("Invalid marker in %s", line)
+        return True
+
+
+def filter_requirements(items, python_version=vars.DEFAULT_PYTHON_VERSION):
+    """Cleans and eliminates duplicate requirements.
+
+    Requirements whose environment marker does not match an image running
+    `python_version` are left out, markers are not written.
+    Output is sorted by normalized package name, so the same input
+    always gives the same text. Raise RequirementsConflict if no
+    version can match all specifiers of a package.
+    """
+    # Heavy imports, only needed by merge commands
+    import requirements as req_tool  # pylint: disable=C0415
+    from packaging.specifiers import SpecifierSet  # pylint: disable=C0415
+    from packaging.utils import canonicalize_name  # pylint: disable=C0415
 
     requirements = "\n".join(deduplicate(items))
+    environment = get_marker_environment(python_version)
 
     reqs = {}
     res = []
+    conflicts = {}
 
     for item in req_tool.parse(requirements):
+        if not item.name:
+            continue
+        if not match_marker(item.line, environment):
+            _logger.debug("Skip %s, marker does not match", item.line)
+            continue
         # Dict used to merge packages by name
-        reqs.setdefault(item.name, [])
-        reqs[item.name] += [SpecifierSet("".join(specs)) for specs in item.specs]
+        name = canonicalize_name(item.name)
+        reqs.setdefault(name, [])
+        reqs[name] += [SpecifierSet("".join(specs)) for specs in item.specs]
 
-    for name, specs in reqs.items():
+    for name, specs in sorted(reqs.items()):
         if not name:
             continue
 
@@ -102,15 +339,46 @@ def filter_requirements(items):
             res.append(name)
             continue
 
-        # Sort specifiers and keep only last one
-        # FIXME: Not perfect IMHO, errors possible, fix it !
-        specs = sorted({*specs}, key=str)
-        res.append("".join([name, str(specs[-1])]))
+        # Intersection of all specifiers, printed in a stable order
+        specifier = SpecifierSet()
+        for spec in specs:
+            specifier &= spec
+        if is_empty_specifier(specifier):
+            conflicts[name] = f"no version matches {specifier}"
+        res.append("".join([name, str(specifier)]))
+
+    if conflicts:
+        raise RequirementsConflict(conflicts)
 
-    _logger.debug("Filtered requirements: %s", requirements)
+    _logger.debug("Filtered requirements: %s", res)
     return res
 
 
+def get_dir_size(path):
+    """Return total size in bytes of files under path."""
+
+    size = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                size += os.lstat(os.path.join(root, file)).st_size
+            except OSError:
+                continue
+
+    return size
+
+
+def format_size(size):
+    """Return human readable size."""
+
+    for unit in ["B", "KB", "MB", "GB"]:
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+
+    return f"{size:.1f} TB"
+
+
 def nested_set(dic, keys, value):
     """Update nested dict."""
     for key in keys[:-1]:
@@ -138,33 +406,6 @@ def dict_merge(dct, merge_dct):
             dct[key] = merge_dct[key]
 
 
-def bytes_to_json(data):
-    """Convert stdout bytes to json array."""
-
-    res = data.rstrip().decode("utf8").replace("'", '"').replace("\n", ",")
-    res = "[" + res + "]"
-    res = res.replace(",]", "]")
-    json_data = json.loads(res)
-
-    return json_data
-
-
-def convert_stdout_to_json(content):
-    """Convert stdout bytes to json array."""
-
-    try:
-        data = json.loads(content)
-    except json.decoder.JSONDecodeError:
-        content = content.decode("utf8")
-        content = content.strip().rstrip().lstrip()
-        content = f"[{content}]"
-        content = content.replace("}", "},").replace("},]", "}]")
-
-        data = json.loads(content)
-
-    return data
-
-
 def split_var(key, separator="."):
     """Split vars."""
 
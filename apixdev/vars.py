@@ -9,6 +9,7 @@ CONFIG_PATH = ".config/apix"
 CONFIG_FILE = "config.ini"
 
 DEFAULT_TIMEOUT = 60
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
 DOCKER_SERVICES_COUNT = 3
 
 LOGGING_FILE = "apix.log"
@@ -19,6 +20,16 @@ DEFAULT_PROTOCOL = "jsonrpc+ssl"
 DEFAULT_TIMEOUT = 6000
 DEFAULT_PASSWORD = "admin"
 DEFAULT_NO_VERIFY = False
+DEFAULT_JOBS = 4
+DEFAULT_GIT_CACHE = True
+# git-aggregator fetch options making a shallow clone, not cached
+GIT_SHALLOW_OPTIONS = ["depth", "shallow-since", "shallow-exclude"]
+DEFAULT_PIP_INDEX = "https://pypi.org/simple"
+DEFAULT_PYTHON_VERSION = "3.10"
+# glibc of Odoo images (Debian bullseye), newest manylinux wheels installable
+IMAGE_GLIBC_VERSION = (2, 31)
+# merge_requirements options kept by a locked project
+LOCK_OPTIONS = ["index_url", "wheel_dir", "python_version"]
 
 MANDATORY_VALUES = [
     "apix.database",
@@ -35,9 +46,29 @@ MANDATORY_VALUES = [
     "docker.repository",
 ]
 IGNORED_VALUES = ["password"]
+SESSION_FILE = "session.json"
+SESSION_TTL = 12 * 3600
+CATALOG_FILE = "catalog.sqlite"
+CATALOG_FIELDS = [
+    "name",
+    "uuid",
+    "major_version",
+    "manifest_url",
+    "repositories_url",
+    "compose_url",
+    "write_date",
+]
+CATALOG_MIN_SCORE = 0.2
+SAAS_DATABASE_MODEL = "saas.database"
+RPC_PAGE_SIZE = 500
+REGISTRY_FILE = "projects.json"
 BACKUP_URL = "{}/web/database/backup"
 RESTORE_URL = "{}/web/database/restore"
 LOCAL_URL = "http://localhost:8069"
+ODOO_HEALTH_PATHS = ["/web/health", "/web/login"]
+WAIT_TIMEOUT = 180
+WAIT_BACKOFF = (0.2, 2.0)
+STARTUP_HISTORY = 20
 ODOORPC_OPTIONS = [
     "port",
     "protocol",
@@ -55,10 +86,70 @@ DOCKER_COMPOSE_RUN_DEV = (
 DOCKER_COMPOSE_RUN = "docker-compose run --rm --service-ports odoo bash"
 DOCKER_COMPOSE_DOWN = "docker-compose down"
 DOCKER_COMPOSE_PS = "docker compose ps --format json"
-DOCKER_PS = "docker ps --format json"
+DOCKER_PS = "docker ps --filter label={}={} --format json"
+DOCKER_PS_LABEL = "docker ps --filter label={} --format json"
 DOCKER_LOGS = "docker logs -f {}"
+DOCKER_SERVICES = ["odoo", "pg", "redis"]
+LOGS_BUFFER_SIZE = 30000
+LOGS_WINDOW = 0.2
+LOGS_LEVEL_SEARCH_LENGTH = 120
+PERF_LOG_PATTERN = r" werkzeug: "
+LOG_LEVELS = {
+    "DEBUG": 10,
+    "INFO": 20,
+    "LOG": 20,
+    "WARNING": 30,
+    "ERROR": 40,
+    "CRITICAL": 50,
+    "FATAL": 50,
+    "PANIC": 50,
+}
 DOCKER_EXEC = "docker exec -it {} {}"
 DOCKER_LIST_IMAGES = "docker image ls --format json"
+DOCKER_IMAGE_INSPECT = "docker image inspect {}"
+DOCKER_PULL = "docker pull {}"
+DOCKER_BUILD = "docker build --tag {} {}"
+
+BAKE_REPOSITORY = "apix"
+BAKE_DOCKERFILE = """# syntax=docker/dockerfile:1
+FROM {image}
+USER root
+COPY requirements.txt /tmp/apix-requirements.txt
+RUN --mount=type=cache,target=/root/.cache/pip,sharing=locked \\
+    pip install -r /tmp/apix-requirements.txt
+USER {user}
+"""
+
+DOCKER_SOCKET = "/var/run/docker.sock"
+DOCKER_API_TIMEOUT = 10
+DOCKER_COMPOSE_PROJECT_LABEL = "com.docker.compose.project"
+DOCKER_INSPECT_TTL = 5
+
+MODULE_MANIFEST = "__manifest__.py"
+MODULE_TYPO_CUTOFF = 0.85
+REQUIREMENTS_FILE = "requirements.txt"
+# repositories/<repository>/<addon>, with one more level for nested repositories
+SCAN_MAX_DEPTH = 3
+SCAN_IGNORED_DIRS = [
+    "node_modules",
+    "static",
+    "i18n",
+    "i18n_extra",
+    "tests",
+    "migrations",
+    "__pycache__",
+]
+
+DEFAULT_PG_USER = "odoo"
+ODOO_DATA_DIR = "/var/lib/odoo"
+RESTORE_DUMP_PATH = "/tmp/apix-restore.dump"
+PG_DUMP_MAGIC = b"PGDMP"
 
 ODOO_MODULES = "odoo -d {} --stop-after-init {} {}"
 ODOO_SHELL = "odoo shell -d {}"
+# Modules of every addons path of the Odoo configuration, core included
+ODOO_LIST_MODULES = (
+    "import odoo; from odoo.modules import module; "
+    "odoo.tools.config.parse_config([]); module.initialize_sys_path(); "
+    "print('\\n'.join(module.get_modules()))"
+)
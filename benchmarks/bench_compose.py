@@ -0,0 +1,89 @@
+"""Benchmark loading and saving a large docker-compose.yaml.
+
+Pure Python PyYAML is measured next to the libyaml loader and dumper used
+by `Compose`, then `Compose.from_path` cold and cached, and `save` with
+changed and unchanged content.
+"""
+
+import os
+import tempfile
+
+import yaml
+from common import measure, report, setup_home
+
+SERVICES = 300
+
+
+def generate_content(services=SERVICES):
+    """Return compose content with `services` services."""
+
+    return {
+        "version": "3.8",
+        "services": {
+            f"service-{index}": {
+                "image": f"registry.example.com/apix/odoo:16.0-{index}",
+                "restart": "unless-stopped",
+                "depends_on": ["pg", "redis"],
+                "environment": {
+                    f"VARIABLE_{key}": f"value {key} of service {index}"
+                    for key in range(20)
+                },
+                "volumes": [
+                    f"./repositories/repo-{key}:/mnt/extra-addons/repo-{key}:ro"
+                    for key in range(10)
+                ],
+                "labels": {f"com.example.label-{key}": str(key) for key in range(5)},
+                "ports": [f"{8000 + index}:8069"],
+            }
+            for index in range(services)
+        },
+        "volumes": {f"volume-{index}": {} for index in range(services)},
+    }
+
+
+def main():
+    setup_home()
+
+    # pylint: disable=C0415
+    from apixdev.core.compose import Compose, dump_yaml, load_yaml
+
+    with tempfile.TemporaryDirectory(prefix="apix-bench-compose-") as path:
+        filepath = os.path.join(path, "docker-compose.yaml")
+        text = dump_yaml(generate_content())
+        with open(filepath, "wb") as file:
+            file.write(text)
+        print(f"{SERVICES} services, {len(text) / 1e6:.1f} MB")
+
+        seconds, content = measure(lambda: yaml.safe_load(text), 3)
+        report("yaml.safe_load (pure Python)", seconds)
+        seconds, _ = measure(lambda: load_yaml(text))
+        report("load_yaml", seconds)
+
+        seconds, _ = measure(lambda: yaml.safe_dump(content).encode("utf8"), 3)
+        report("yaml.safe_dump (pure Python)", seconds)
+        seconds, _ = measure(lambda: dump_yaml(content))
+        report("dump_yaml", seconds)
+
+        def load_cold():
+            # Changed mtime invalidates the cached document
+            os.utime(filepath)
+            return Compose.from_path(filepath)
+
+        seconds, compose = measure(load_cold)
+        report("Compose.from_path (cold)", seconds)
+        seconds, _ = measure(lambda: Compose.from_path(filepath))
+        report("Compose.from_path (cached)", seconds)
+
+        seconds, _ = measure(lambda: compose.save(filepath))
+        report("Compose.save (unchanged)", seconds)
+
+        def save_changed():
+            compose.update("services/service-0/environment/CHANGED", str(os.urandom(4)))
+            return compose.save(filepath)
+
+        seconds, _ = measure(save_changed)
+        report("Compose.save (changed)", seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmark `Images.ls` on a synthetic 10k-line `docker image ls` dump.
+
+A fake docker CLI prints the dump, `Images.ls` decodes it as it is read
+from the pipe. Decoding alone is also measured on in-memory lines, with
+peak memory of both.
+"""
+
+import json
+import os
+import random
+import tempfile
+import tracemalloc
+
+from common import measure, report, setup_home
+
+LINES = 10_000
+
+FAKE_DOCKER = """#!/bin/sh
+cat "{dump}"
+"""
+
+
+def generate_dump(path, count=LINES):
+    """Write `count` image records, one in ten from the ApiX repository."""
+
+    rand = random.Random(0)
+    with open(path, "w", encoding="utf8") as file:
+        for index in range(count):
+            repository = "apix" if index % 10 == 0 else f"library/image-{index}"
+            record = {
+                "Containers": "N/A",
+                "CreatedAt": "2024-01-01 12:00:00 +0000 UTC",
+                "CreatedSince": "3 months ago",
+                "Digest": "<none>",
+                "ID": f"{rand.getrandbits(48):012x}",
+                "Repository": repository,
+                "SharedSize": "N/A",
+                "Size": f"{rand.randint(10, 2000)}MB",
+                "Tag": f"16.0-{index}",
+                "UniqueSize": "N/A",
+                "VirtualSize": f"{rand.randint(10, 2000)}MB",
+            }
+            file.write(json.dumps(record) + "\n")
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    setup_home()
+
+    # pylint: disable=C0415
+    from apixdev.core.images import Images
+    from apixdev.core.tools import iter_json_lines
+
+    with tempfile.TemporaryDirectory(prefix="apix-bench-images-") as path:
+        dump = os.path.join(path, "images.json")
+        generate_dump(dump)
+
+        docker = os.path.join(path, "docker")
+        with open(docker, "w", encoding="utf8") as file:
+            file.write(FAKE_DOCKER.format(dump=dump))
+        os.chmod(docker, 0o755)
+        os.environ["PATH"] = f"{path}{os.pathsep}{os.environ['PATH']}"
+
+        with open(dump, "rb") as file:
+            lines = file.readlines()
+
+        print(f"{LINES} image records, {os.path.getsize(dump) / 1e6:.1f} MB")
+
+        seconds, records = measure(lambda: list(iter_json_lines(lines)))
+        report("iter_json_lines (in memory)", seconds, len(records), "records")
+
+        seconds, images = measure(Images.ls)
+        report("Images.ls (fake docker pipe)", seconds, LINES, "records")
+        assert len(images) == LINES // 10, len(images)
+
+        peak = peak_memory(Images.ls)
+        print(f"Images.ls peak Python memory: {peak / 1e6:.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Benchmark requirements discovery on a generated 100k-file repositories tree.
+
+Repositories hold addons with sources, static assets, translations and a
+.git directory full of objects, like checkouts made by git-aggregator.
+`find_files` and `get_requirements_from_path` are measured cold (no
+index) and with the index of a previous run, next to a plain `os.walk`.
+"""
+
+import os
+import tempfile
+
+from common import measure, report, setup_home
+
+REPOSITORIES = 20
+ADDONS = 40
+ADDON_FILES = {"models": 10, "views": 5, "static/src/js": 40, "i18n": 20}
+GIT_OBJECTS = 2000
+
+
+def touch(path, content=""):
+    with open(path, "w", encoding="utf8") as file:
+        file.write(content)
+
+
+def generate_tree(path):
+    """Generate repositories tree under `path`, return its number of files."""
+
+    count = 0
+    for repo in range(REPOSITORIES):
+        repo_path = os.path.join(path, f"repo-{repo}")
+
+        objects = os.path.join(repo_path, ".git", "objects")
+        for index in range(GIT_OBJECTS):
+            directory = os.path.join(objects, f"{index % 256:02x}")
+            os.makedirs(directory, exist_ok=True)
+            touch(os.path.join(directory, f"{index:038x}"))
+        count += GIT_OBJECTS
+
+        touch(os.path.join(repo_path, "requirements.txt"), f"package-{repo}\n")
+        count += 1
+
+        for addon in range(ADDONS):
+            addon_path = os.path.join(repo_path, f"addon_{addon}")
+            for directory, files in ADDON_FILES.items():
+                os.makedirs(os.path.join(addon_path, directory))
+                for index in range(files):
+                    touch(os.path.join(addon_path, directory, f"file_{index}"))
+                count += files
+
+            touch(os.path.join(addon_path, "__manifest__.py"), "{}\n")
+            count += 1
+            if addon % 4 == 0:
+                touch(
+                    os.path.join(addon_path, "requirements.txt"),
+                    f"lib-{addon}>=1.0\npackage-{repo}\n",
+                )
+                count += 1
+
+    return count
+
+
+def walk(path):
+    return [
+        os.path.join(root, "requirements.txt")
+        for root, _, files in os.walk(path)
+        if "requirements.txt" in files
+    ]
+
+
+def main():
+    setup_home()
+
+    # pylint: disable=C0415
+    from apixdev.core.settings import vars
+    from apixdev.core.tools import find_files, get_requirements_from_path
+
+    with tempfile.TemporaryDirectory(prefix="apix-bench-requirements-") as path:
+        count = generate_tree(path)
+        print(f"{count} files in {REPOSITORIES} repositories")
+
+        seconds, found = measure(lambda: walk(path))
+        report("os.walk (whole tree)", seconds, count, "files")
+
+        seconds, entries = measure(
+            lambda: list(find_files(path, vars.REQUIREMENTS_FILE))
+        )
+        report("find_files", seconds, count, "files")
+        assert len(entries) == len(found), (len(entries), len(found))
+
+        seconds, _ = measure(lambda: get_requirements_from_path(path, {}))
+        report("get_requirements_from_path (cold)", seconds, count, "files")
+
+        index = {}
+        get_requirements_from_path(path, index)
+        seconds, requirements = measure(lambda: get_requirements_from_path(path, index))
+        report("get_requirements_from_path (index)", seconds, count, "files")
+
+        # One changed file is read again, the others come from the index
+        touch(entries[0].path, "changed\n")
+        seconds, _ = measure(lambda: get_requirements_from_path(path, index), 1)
+        report("get_requirements_from_path (1 changed)", seconds, count, "files")
+
+        print(f"{len(entries)} requirements files, {len(requirements)} requirements")
+
+
+if __name__ == "__main__":
+    main()
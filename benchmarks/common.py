@@ -0,0 +1,79 @@
+"""Shared setup of benchmark scripts.
+
+Benchmarks are plain scripts, run from the repository root, e.g.:
+
+    python benchmarks/bench_images.py
+
+They never read the user configuration, HOME is pointed to a temporary
+directory before apixdev is imported.
+"""
+
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CONFIG = """[apix]
+url = 127.0.0.1
+port = 8069
+protocol = jsonrpc
+timeout = 60
+no_verify = False
+database = apix
+user = admin
+password = admin
+token = secret
+
+[local]
+default_password = admin
+workdir = {workdir}
+git_cache = False
+
+[docker]
+repository = apix
+"""
+
+
+def setup_home():
+    """Point HOME to a temporary configuration, return its path."""
+
+    home = tempfile.mkdtemp(prefix="apix-bench-")
+    atexit.register(shutil.rmtree, home, True)
+
+    workdir = os.path.join(home, "work")
+    os.makedirs(os.path.join(home, ".config", "apix"))
+    os.makedirs(workdir)
+    with open(
+        os.path.join(home, ".config", "apix", "config.ini"), "w", encoding="utf8"
+    ) as file:
+        file.write(CONFIG.format(workdir=workdir))
+
+    os.environ["HOME"] = home
+    sys.path.insert(0, ROOT)
+    return home
+
+
+def measure(func, repeat=5):
+    """Call `func` `repeat` times, return (best seconds, last result)."""
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        res = func()
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+
+    return best, res
+
+
+def report(name, seconds, count=None, unit="items"):
+    """Print one benchmark line, with throughput if `count` is given."""
+
+    line = f"{name:<44} {seconds * 1000:10.1f} ms"
+    if count:
+        line += f"  {count / seconds:14,.0f} {unit}/s"
+    print(line)
@@ -41,7 +41,6 @@ setup(
         "requirements-parser>=0.5.0",
         "git-aggregator>=4.0",
         "packaging>=23.1",
-        "pandas>=2.0.0",
     ],
     entry_points={
         "console_scripts": [
@@ -0,0 +1,153 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# Settings are read from HOME when apixdev is imported, tests must never
+# touch the user configuration
+HOME = tempfile.mkdtemp(prefix="apix-tests-")
+WORKDIR = os.path.join(HOME, "work")
+
+CONFIG = f"""[apix]
+url = 127.0.0.1
+port = 8069
+protocol = jsonrpc
+timeout = 60
+no_verify = False
+database = apix
+user = admin
+password = admin
+token = secret
+
+[local]
+default_password = admin
+workdir = {WORKDIR}
+jobs = 4
+git_cache = False
+
+[git]
+remote_url = https://git.example.com
+remote_login = login
+remote_token = token
+
+[docker]
+repository = apix
+"""
+
+os.environ["HOME"] = HOME
+os.makedirs(os.path.join(HOME, ".config", "apix"))
+os.makedirs(WORKDIR)
+with open(
+    os.path.join(HOME, ".config", "apix", "config.ini"), "w", encoding="utf8"
+) as config_file:
+    config_file.write(CONFIG)
+
+
+def pytest_sessionfinish(session, exitstatus):  # pylint: disable=W0613
+    shutil.rmtree(HOME, ignore_errors=True)
+
+
+FAKE_DOCKER = """#!/bin/sh
+printf '%s\\n' "$*" >> "$APIX_TEST_DOCKER_LOG"
+case "$1 $2" in
+  "compose ps")
+    for service in odoo pg redis; do
+      echo "{\\"Name\\": \\"$APIX_TEST_PROJECT-$service-1\\", \\"State\\": \\"running\\"}"
+    done;;
+  "exec "*)
+    case "$*" in *python3*) echo base; echo web;; esac;;
+esac
+"""
+
+
+@pytest.fixture
+def http_server():
+    """Start a local HTTP server for a handler class, return its base url."""
+
+    servers = []
+
+    def start(handler):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def project(request):
+    """Ready project in the test workdir, named after the test."""
+    from apixdev.core.project import Project
+
+    name = request.node.name.replace("[", "-").rstrip("]")
+    path = os.path.join(WORKDIR, name)
+    os.makedirs(os.path.join(path, "repositories"))
+
+    files = {
+        "manifest.yaml": "uuid: 1234\nmajor_version: '16.0'\n",
+        "docker-compose.yaml": "services:\n  odoo:\n    image: odoo:16.0\n",
+        "repositories.yaml": "{}\n",
+    }
+    for filename, content in files.items():
+        with open(os.path.join(path, filename), "w", encoding="utf8") as file:
+            file.write(content)
+
+    return Project(name)
+
+
+@pytest.fixture
+def fake_docker(tmp_path, monkeypatch, project):
+    """Put a fake docker CLI first in PATH, return a function reading its calls.
+
+    The Docker Engine socket is made unreachable, stacks are inspected
+    through the CLI.
+    """
+
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    log_file = tmp_path / "docker.log"
+    log_file.touch()
+
+    docker = bin_path / "docker"
+    docker.write_text(FAKE_DOCKER, encoding="utf8")
+    docker.chmod(0o755)
+
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("DOCKER_HOST", f"unix://{tmp_path / 'missing.sock'}")
+    monkeypatch.setenv("APIX_TEST_DOCKER_LOG", str(log_file))
+    monkeypatch.setenv("APIX_TEST_PROJECT", project.get_stack().project_name)
+
+    def calls():
+        return log_file.read_text(encoding="utf8").splitlines()
+
+    return calls
+
+
+@pytest.fixture
+def run_apix():
+    """Run apix in a new interpreter, return the completed process."""
+
+    def run(*args, code=None):
+        code = code or "from apixdev.cli.main import cli; cli()"
+        return subprocess.run(
+            [sys.executable, "-c", code, *args],
+            capture_output=True,
+            text=True,
+            check=False,
+            env={
+                **os.environ,
+                "PYTHONPATH": os.path.dirname(os.path.dirname(__file__)),
+            },
+        )
+
+    return run
@@ -0,0 +1,254 @@
+import io
+import os
+import subprocess
+import zipfile
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from apixdev.core.backup import Backup
+from apixdev.core.exceptions import RestoreError
+from apixdev.core.settings import vars
+
+DUMP = b"CREATE TABLE test (id int);\n" * 20000
+ETAG = '"backup-1"'
+
+
+def make_zip(seekable=True, compression=zipfile.ZIP_DEFLATED):
+    """Return an Odoo backup archive, without local sizes if not seekable."""
+
+    class Unseekable(io.RawIOBase):
+        def __init__(self):
+            self.data = bytearray()
+
+        def writable(self):
+            return True
+
+        def write(self, data):  # pylint: disable=W0221
+            self.data += data
+            return len(data)
+
+    output = io.BytesIO() if seekable else Unseekable()
+    with zipfile.ZipFile(output, "w", compression=compression) as archive:
+        archive.writestr("manifest.json", "{}")
+        archive.writestr("dump.sql", DUMP)
+        archive.writestr("filestore/ab/abcd", b"attachment" * 1000)
+        archive.writestr("filestore/cd/cdef", b"")
+
+    return bytes(output.getvalue() if seekable else output.data)
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serve `body` at any path, with ETag and byte ranges."""
+
+    body = b""
+    requests = []
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+    def do_GET(self):  # pylint: disable=C0103
+        self.requests.append(dict(self.headers))
+
+        if self.path != "/backup":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        offset = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") == ETAG:
+            offset = int(self.headers["Range"][len("bytes=") : -1])
+
+        self.send_response(206 if offset else 200)
+        self.send_header("ETag", ETAG)
+        self.send_header("Content-Length", str(len(self.body) - offset))
+        self.end_headers()
+        self.wfile.write(self.body[offset:])
+
+
+class Container:
+    """Container running commands locally, in `root` directory."""
+
+    def __init__(self, root, databases=""):
+        self.root = root
+        self.databases = databases
+        self.calls = []
+        self.fail = set()
+
+    def _command(self, args):
+        commands = {
+            "psql": f"cat > {self.root}/dump.sql",
+            "tar": f"mkdir -p {self.root}/data && tar -x -C {self.root}/data",
+            "pg_restore": f"cat > {self.root}/restored.dump",
+            "sh": f"cat > {self.root}/copied.dump",
+        }
+        return (
+            f"exit 3; {commands[args[0]]}"
+            if args[0] in self.fail
+            else commands[args[0]]
+        )
+
+    def execute(self, args):
+        self.calls.append(args)
+        return args[0] not in self.fail
+
+    def get_output(self, args):
+        self.calls.append(args)
+        return self.databases
+
+    def popen(self, args):
+        self.calls.append(args)
+        return subprocess.Popen(  # pylint: disable=R1732
+            ["sh", "-c", self._command(args)],
+            stdin=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def copy_to(self, filepath, container_path):
+        self.calls.append(["cp", filepath, container_path])
+        return True
+
+
+@pytest.fixture
+def backup(http_server, tmp_path):
+    Handler.body = make_zip()
+    Handler.requests = []
+    url = http_server(Handler)
+    return Backup(f"{url}/backup", str(tmp_path / "local" / "backup"))
+
+
+@pytest.fixture
+def containers(tmp_path):
+    (tmp_path / "pg").mkdir()
+    (tmp_path / "odoo").mkdir()
+    return Container(tmp_path / "pg"), Container(tmp_path / "odoo")
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize(
+    "seekable, compression",
+    [
+        (True, zipfile.ZIP_DEFLATED),
+        (True, zipfile.ZIP_STORED),
+        (False, zipfile.ZIP_DEFLATED),
+    ],
+)
+def test_zip_restored_while_downloaded(backup, containers, seekable, compression):
+    Handler.body = make_zip(seekable, compression)
+    pg, odoo = containers
+
+    stats = backup.restore(pg, odoo, "db")
+
+    assert [item["phase"] for item in stats] == ["download", "database", "filestore"]
+    assert stats[0]["bytes"] == len(Handler.body)
+    assert stats[1]["bytes"] == len(DUMP)
+    assert read(pg.root / "dump.sql") == DUMP
+    filestore = odoo.root / "data" / "filestore" / "db"
+    assert read(filestore / "ab" / "abcd") == b"attachment" * 1000
+    assert read(filestore / "cd" / "cdef") == b""
+    assert ["createdb", "-U", vars.DEFAULT_PG_USER, "db"] in pg.calls
+    assert not os.path.exists(os.path.dirname(backup.filepath))
+
+
+def test_kept_backup_restored_again_without_download(backup, containers):
+    pg, odoo = containers
+
+    backup.restore(pg, odoo, "db", keep=True)
+    assert read(backup.filepath) == Handler.body
+
+    Handler.requests = []
+    stats = backup.restore(pg, odoo, "db2", keep=True)
+
+    assert not Handler.requests
+    assert stats[0]["bytes"] == 0
+    assert read(pg.root / "dump.sql") == DUMP
+
+
+def test_partial_download_resumed(backup, containers):
+    os.makedirs(os.path.dirname(backup.filepath))
+    with open(backup.part_filepath, "wb") as file:
+        file.write(Handler.body[:1000])
+    backup.write_info(ETAG)
+
+    stats = backup.restore(*containers, "db", keep=True)
+
+    assert Handler.requests[-1]["Range"] == "bytes=1000-"
+    assert stats[0]["bytes"] == len(Handler.body) - 1000
+    assert read(backup.filepath) == Handler.body
+    assert read(containers[0].root / "dump.sql") == DUMP
+
+
+def test_dump_piped_to_pg_restore(backup, containers):
+    Handler.body = vars.PG_DUMP_MAGIC + b"custom format dump"
+    pg, odoo = containers
+
+    stats = backup.restore(pg, odoo, "db", jobs=1)
+
+    assert [item["phase"] for item in stats] == ["download", "database"]
+    assert read(pg.root / "restored.dump") == Handler.body
+    assert not any(call[0] == "sh" for call in pg.calls)
+
+
+def test_dump_copied_once_for_parallel_jobs(backup, containers):
+    Handler.body = vars.PG_DUMP_MAGIC + b"custom format dump"
+    pg, odoo = containers
+
+    backup.restore(pg, odoo, "db", jobs=4)
+    assert read(pg.root / "copied.dump") == Handler.body
+
+    # A kept backup is copied with docker cp
+    backup.restore(pg, odoo, "db2", jobs=4, keep=True)
+    backup.restore(pg, odoo, "db3", jobs=4, keep=True)
+    assert ["cp", backup.filepath, vars.RESTORE_DUMP_PATH] in pg.calls
+    assert [call for call in pg.calls if call[0] == "pg_restore"][-1][-2:] == [
+        "--jobs=4",
+        vars.RESTORE_DUMP_PATH,
+    ]
+
+
+def test_existing_database_replaced_only_on_demand(backup, containers):
+    pg, odoo = containers
+    pg.databases = "postgres|odoo\ndb|odoo\n"
+
+    with pytest.raises(RestoreError, match="already exists"):
+        backup.restore(pg, odoo, "db")
+    assert not any(call[0] == "createdb" for call in pg.calls)
+
+    backup.restore(pg, odoo, "db", replace=True)
+    assert ["dropdb", "-U", vars.DEFAULT_PG_USER, "--if-exists", "db"] in pg.calls
+
+
+def test_failed_restore_drops_database(backup, containers):
+    pg, odoo = containers
+    pg.fail.add("psql")
+
+    with pytest.raises(RestoreError, match="Database restore failed"):
+        backup.restore(pg, odoo, "db")
+
+    assert pg.calls[-1][0] == "dropdb"
+    assert odoo.calls[-1][:2] == ["rm", "-rf"]
+
+
+@pytest.mark.parametrize(
+    "url, match",
+    [("/missing", "404"), ("http://127.0.0.1:1/backup", "download failed")],
+)
+def test_download_error(backup, containers, url, match):
+    backup.url = url if url.startswith("http") else backup.url.replace("/backup", url)
+
+    with pytest.raises(RestoreError, match=match):
+        backup.restore(*containers, "db")
+
+    assert containers[0].calls[-1][0] == "dropdb"
+
+
+def test_unknown_format(backup, containers):
+    Handler.body = b"not a backup"
+
+    with pytest.raises(RestoreError, match="Unknown backup format"):
+        backup.restore(*containers, "db")
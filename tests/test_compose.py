@@ -0,0 +1,40 @@
+import os
+
+from apixdev.core.compose import Compose
+
+
+def write(path, content):
+    with open(path, "w", encoding="utf8") as file:
+        file.write(content)
+
+
+def test_cached_document_is_an_independent_copy(tmp_path):
+    filepath = str(tmp_path / "docker-compose.yaml")
+    write(filepath, "services:\n  odoo:\n    environment:\n      A: '1'\n")
+
+    compose = Compose.from_path(filepath)
+    compose.update("services/odoo/environment/B", "2")
+    compose.extract("services/odoo/environment")["A"] = "changed"
+
+    again = Compose.from_path(filepath)
+    assert again.extract("services/odoo/environment") == {"A": "1"}
+    assert again._content is not compose._content
+
+
+def test_cache_follows_file_changes(tmp_path):
+    filepath = str(tmp_path / "docker-compose.yaml")
+    write(filepath, "services:\n  odoo:\n    image: odoo:16.0\n")
+    assert Compose.from_path(filepath).extract("services/odoo/image") == "odoo:16.0"
+
+    compose = Compose.from_path(filepath)
+    compose.update("services/odoo/image", "odoo:17.0")
+    assert compose.save(filepath)
+    assert not compose.save(filepath)
+    assert Compose.from_path(filepath).extract("services/odoo/image") == "odoo:17.0"
+
+    # Rewritten by another tool, same size but a new mtime
+    write(filepath, "services:\n  odoo:\n    image: odoo:18.0\n")
+    stat = os.stat(filepath)
+    os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert Compose.from_path(filepath).extract("services/odoo/image") == "odoo:18.0"
+    assert not os.path.exists(f"{filepath}.tmp")
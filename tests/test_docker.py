@@ -0,0 +1,131 @@
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+from click.testing import CliRunner
+
+from apixdev.cli.main import cli
+from apixdev.core.docker import DockerClient
+from apixdev.core.settings import vars
+
+
+class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class EngineHandler(BaseHTTPRequestHandler):
+    """Docker Engine API stand-in, answers with `status` and `containers`."""
+
+    protocol_version = "HTTP/1.1"
+    status = 200
+    containers = []
+    connections = 0
+    requests = []
+
+    def setup(self):
+        super().setup()
+        EngineHandler.connections += 1
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+    def do_GET(self):  # pylint: disable=C0103
+        url = urlsplit(self.path)
+        self.requests.append((url.path, parse_qs(url.query)))
+
+        body = json.dumps(self.containers).encode("utf8")
+        self.send_response(self.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def is_inspection(call):
+    return call.startswith(("compose ps", "ps "))
+
+
+@pytest.mark.parametrize(
+    "args, execs",
+    [
+        (["shell", "{project}", "db"], 1),
+        # Unknown module name is looked up in the container addons paths
+        (["install-modules", "{project}", "db", "base"], 2),
+        (["install-modules", "{project}", "db", "base", "--no-check"], 1),
+    ],
+)
+def test_command_inspects_stack_once(fake_docker, project, args, execs):
+    args = [arg.format(project=project.name) for arg in args]
+    res = CliRunner().invoke(cli, ["project", *args])
+
+    assert res.exit_code == 0, res.output
+    calls = fake_docker()
+    assert len([call for call in calls if is_inspection(call)]) == 1
+    assert len([call for call in calls if call.startswith("exec ")]) == execs
+    assert len(calls) == execs + 1
+
+
+def test_snapshot_invalidated_after_stop(fake_docker, project):
+    stack = project.get_stack()
+
+    assert stack.is_running
+    stack.get_odoo_container()
+    assert len(fake_docker()) == 1
+
+    stack.stop(quiet=True)
+    assert stack.is_running
+    assert len([call for call in fake_docker() if is_inspection(call)]) == 2
+
+
+@pytest.fixture
+def docker_engine(tmp_path, monkeypatch, fake_docker):
+    """Serve Docker Engine API stand-in on a unix socket set as DOCKER_HOST."""
+
+    EngineHandler.status = 200
+    EngineHandler.containers = []
+    EngineHandler.connections = 0
+    EngineHandler.requests = []
+
+    socket_path = str(tmp_path / "docker.sock")
+    server = UnixHTTPServer(socket_path, EngineHandler)
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    monkeypatch.setenv("DOCKER_HOST", f"unix://{socket_path}")
+
+    yield fake_docker
+
+    DockerClient.new(socket_path).close()
+    server.shutdown()
+    server.server_close()
+
+
+def test_engine_api_inspections_reuse_connection(docker_engine, project):
+    stack = project.get_stack()
+    EngineHandler.containers = [
+        {"Names": [f"/{stack.project_name}-{service}-1"], "State": "running"}
+        for service in ["odoo", "pg", "redis"]
+    ]
+
+    for _ in range(3):
+        stack.invalidate()
+        assert stack.is_running
+
+    label = f"{vars.DOCKER_COMPOSE_PROJECT_LABEL}={stack.project_name}"
+    assert (
+        EngineHandler.requests
+        == [("/containers/json", {"filters": [json.dumps({"label": [label]})]})] * 3
+    )
+    assert EngineHandler.connections == 1
+    assert stack.get_odoo_container().name == f"{stack.project_name}-odoo-1"
+    assert not docker_engine()
+
+
+def test_engine_api_error_falls_back_to_cli(docker_engine, project):
+    EngineHandler.status = 500
+    stack = project.get_stack()
+
+    assert stack.is_running
+    assert len(EngineHandler.requests) == 1
+    assert [call for call in docker_engine() if is_inspection(call)]
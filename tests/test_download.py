@@ -0,0 +1,119 @@
+import os
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from apixdev.core.exceptions import DownloadError
+
+FILES = {
+    "/manifest.yaml": (b"uuid: 1234\n", '"manifest-1"'),
+    "/repositories.yaml": (b"{}\n", '"repositories-1"'),
+    "/docker-compose.yaml": (b"services: {}\n", None),
+}
+LAST_MODIFIED = "Mon, 01 Jan 2024 00:00:00 GMT"
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serve FILES with validators, unknown paths fail with a 500."""
+
+    requests = []
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+    def do_GET(self):  # pylint: disable=C0103
+        self.requests.append((self.path, dict(self.headers)))
+
+        if self.path not in FILES:
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        body, etag = FILES[self.path]
+        if etag and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        if not etag and self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        if etag:
+            self.send_header("ETag", etag)
+        else:
+            self.send_header("Last-Modified", LAST_MODIFIED)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(http_server):
+    Handler.requests = []
+    return http_server(Handler)
+
+
+def get_files(url, names=None):
+    return [(name, f"{url}/{name}") for name in names or [p[1:] for p in FILES]]
+
+
+def read(project, filename):
+    with open(os.path.join(project.path, filename), "rb") as file:
+        return file.read()
+
+
+def test_download_all(project, server):
+    results, errors = project.download_all(get_files(server))
+
+    assert not errors
+    assert results == {path[1:]: True for path in FILES}
+    for path, (body, _) in FILES.items():
+        assert read(project, path[1:]) == body
+    assert not [name for name in os.listdir(project.path) if name.endswith(".part")]
+
+
+def test_unchanged_files_not_downloaded_again(project, server):
+    project.download_all(get_files(server))
+    Handler.requests = []
+
+    results, errors = project.download_all(get_files(server))
+
+    assert not errors
+    assert results == {path[1:]: False for path in FILES}
+    headers = dict(Handler.requests)
+    assert headers["/manifest.yaml"]["If-None-Match"] == '"manifest-1"'
+    assert headers["/docker-compose.yaml"]["If-Modified-Since"] == LAST_MODIFIED
+    assert read(project, "manifest.yaml") == FILES["/manifest.yaml"][0]
+
+
+def test_force_download(project, server):
+    project.download_all(get_files(server))
+    Handler.requests = []
+
+    results, _ = project.download_all(get_files(server), force=True)
+
+    assert all(results.values())
+    for _, headers in Handler.requests:
+        assert "If-None-Match" not in headers
+        assert "If-Modified-Since" not in headers
+
+
+def test_partial_failure(project, server):
+    files = get_files(server, ["manifest.yaml", "missing.yaml"])
+
+    results, errors = project.download_all(files)
+
+    assert results == {"manifest.yaml": True}
+    assert len(errors) == 1
+    assert isinstance(errors[0], DownloadError)
+    assert errors[0].filename == "missing.yaml"
+    assert errors[0].http_code == 500
+    assert read(project, "manifest.yaml") == FILES["/manifest.yaml"][0]
+    assert not os.path.exists(os.path.join(project.path, "missing.yaml"))
+    assert "missing.yaml" not in project.read_state("downloads")
+
+    with pytest.raises(DownloadError):
+        project.download("missing.yaml", f"{server}/missing.yaml")
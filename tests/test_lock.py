@@ -0,0 +1,118 @@
+import os
+import platform
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from apixdev.core.compose import Compose
+from apixdev.core.exceptions import RequirementsConflict
+from apixdev.core.lock import RequirementsLocker
+from apixdev.core.tools import text_to_list
+
+ARCH = {"arm64": "aarch64", "amd64": "x86_64"}.get(
+    platform.machine().lower(), platform.machine().lower()
+)
+
+WHEELS = [
+    "lxml-4.9.0-py3-none-any.whl",
+    f"lxml-5.0.0-cp310-cp310-manylinux_2_17_{ARCH}.manylinux2014_{ARCH}.whl",
+    f"lxml-5.1.0-cp312-cp312-manylinux_2_17_{ARCH}.whl",
+    "lxml-5.2.0-cp310-cp310-win_amd64.whl",
+    f"lxml-5.3.0-cp310-cp310-manylinux_2_39_{ARCH}.whl",
+    "xlrd-2.0.1.tar.gz",
+]
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serve a simple repository API page for lxml."""
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+    def do_GET(self):  # pylint: disable=C0103
+        if self.path != "/lxml/":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        links = [
+            f'<a href="/files/{WHEELS[0]}">',
+            f'<a href="/files/{WHEELS[1]}" data-requires-python="&gt;=3.8">',
+            f'<a href="/files/{WHEELS[2]}">',
+            '<a href="/files/lxml-6.0.0.tar.gz" data-requires-python="&gt;=3.11">',
+            '<a href="/files/lxml-6.1.0.tar.gz" data-yanked="">',
+        ]
+        body = "".join(links).encode("utf8")
+
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def wheel_dir(tmp_path):
+    for filename in WHEELS:
+        (tmp_path / filename).touch()
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize(
+    "python_version, expected",
+    [
+        ("3.10", ["lxml==5.0.0", "xlrd==2.0.1"]),
+        ("3.12", ["lxml==5.1.0", "xlrd==2.0.1"]),
+    ],
+)
+def test_local_wheels_compatible_with_image(wheel_dir, python_version, expected):
+    locker = RequirementsLocker(wheel_dir=wheel_dir, python_version=python_version)
+    assert locker.lock(["lxml", "xlrd"]) == expected
+
+
+@pytest.mark.parametrize(
+    "python_version, expected", [("3.10", "lxml==5.0.0"), ("3.12", "lxml==6.0.0")]
+)
+def test_index_versions(http_server, python_version, expected):
+    locker = RequirementsLocker(http_server(Handler), python_version=python_version)
+    assert locker.lock(["lxml"]) == [expected]
+
+
+def test_index_errors_reported_as_conflicts(http_server):
+    locker = RequirementsLocker(http_server(Handler))
+
+    with pytest.raises(RequirementsConflict) as info:
+        locker.lock(["lxml<4", "missing"])
+    assert info.value.conflicts == {
+        "lxml": "no version matches '<4'",
+        "missing": "package not found",
+    }
+
+    locker = RequirementsLocker("http://127.0.0.1:1")
+    with pytest.raises(RequirementsConflict) as info:
+        locker.lock(["lxml"])
+    assert info.value.conflicts["lxml"].startswith("index request failed")
+
+
+def test_locked_project_stays_locked(project, wheel_dir):
+    addon = os.path.join(project.repositories_path, "repo", "addon")
+    os.makedirs(addon)
+    with open(os.path.join(addon, "requirements.txt"), "w", encoding="utf8") as file:
+        file.write("lxml\nxlrd\n")
+
+    def requirements():
+        compose = Compose.from_path(project.compose_file)
+        return text_to_list(
+            compose.extract("services/odoo/environment/CUSTOM_REQUIREMENTS")
+        )
+
+    project.merge_requirements(lock=True, wheel_dir=wheel_dir)
+    assert requirements() == ["lxml==5.0.0", "xlrd==2.0.1"]
+
+    # Merged again by project update, with the options of the lock
+    changes = project.merge_requirements()
+    assert changes == {"added": [], "removed": []}
+
+    project.merge_requirements(lock=False)
+    assert requirements() == ["lxml", "xlrd"]
+    assert not project.read_state("lock")
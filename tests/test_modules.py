@@ -0,0 +1,136 @@
+import os
+import subprocess
+
+import pytest
+from click.testing import CliRunner
+
+from apixdev.cli.main import cli
+
+MODULES = {
+    "base_mod": [],
+    "mid": ["base_mod"],
+    "top": ["mid"],
+    "other": [],
+    "legacy": ["base_mod"],
+}
+
+
+def git(path, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=path,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def write(path, content=""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf8") as file:
+        file.write(content)
+
+
+def add_repository(project, name, modules):
+    """Create committed repository of `modules` {name: depends}, return its path."""
+
+    path = os.path.join(project.repositories_path, name)
+    for module, depends in modules.items():
+        manifest = {"depends": depends, "installable": module != "legacy"}
+        write(os.path.join(path, module, "__manifest__.py"), repr(manifest))
+        write(os.path.join(path, module, "models", "model.py"), "# model\n")
+
+    git(path, "init", "-q")
+    git(path, "add", "-A")
+    git(path, "commit", "-q", "-m", "init")
+
+    with open(project.repositories_file, "a", encoding="utf8") as file:
+        file.write(f"./repositories/{name}:\n  target: origin main\n")
+    return path
+
+
+@pytest.fixture
+def repository(project):
+    with open(project.repositories_file, "w", encoding="utf8") as file:
+        file.write("")
+    return add_repository(project, "repo_a", MODULES)
+
+
+def update_modules(project, *args):
+    return CliRunner().invoke(
+        cli, ["project", "update-modules", project.name, "db", *args]
+    )
+
+
+def test_changed_needs_a_recorded_update(project, repository):
+    res = update_modules(project, "--changed", "--dry-run")
+
+    assert res.exit_code == 1
+    assert "No update recorded for 'db'" in res.output
+
+
+def test_mark_current(project, repository):
+    res = update_modules(project, "--mark-current")
+    assert res.exit_code == 0, res.output
+
+    res = update_modules(project, "--changed", "--dry-run")
+    assert res.exit_code == 0, res.output
+    assert "Would update: nothing" in res.output
+
+
+@pytest.mark.parametrize("change", ["committed", "uncommitted", "untracked"])
+def test_changed_modules_and_dependents(project, repository, change):
+    update_modules(project, "--mark-current")
+
+    if change == "untracked":
+        write(os.path.join(repository, "mid", "models", "new.py"))
+    else:
+        write(os.path.join(repository, "mid", "models", "model.py"), "# changed\n")
+        if change == "committed":
+            git(repository, "commit", "-q", "-am", "change")
+
+    reasons, _ = project.get_changed_modules("db")
+
+    filepath = os.path.join("repo_a", "mid", "models")
+    filename = "new.py" if change == "untracked" else "model.py"
+    assert reasons == {
+        "mid": f"changed {os.path.join(filepath, filename)}",
+        "top": "depends on mid",
+    }
+
+    res = update_modules(project, "--changed", "--dry-run")
+    assert "Would update: mid,top" in res.output
+
+
+def test_transitive_dependents(project, repository):
+    update_modules(project, "--mark-current")
+    write(os.path.join(repository, "base_mod", "models", "model.py"), "# changed\n")
+    write(os.path.join(repository, "legacy", "models", "model.py"), "# changed\n")
+
+    reasons, _ = project.get_changed_modules("db")
+
+    # Modules not installable are never updated
+    assert reasons == {
+        "base_mod": "changed repo_a/base_mod/models/model.py",
+        "mid": "depends on base_mod",
+        "top": "depends on mid",
+    }
+
+
+def test_new_repository(project, repository):
+    update_modules(project, "--mark-current")
+    add_repository(project, "repo_b", {"extra": ["other"], "extra_2": []})
+
+    reasons, heads = project.get_changed_modules("db")
+
+    assert reasons == {"extra": "new repository", "extra_2": "new repository"}
+    assert set(heads) == {"repositories/repo_a", "repositories/repo_b"}
+
+
+def test_unknown_recorded_commit(project, repository):
+    project.record_module_update("db", {"repositories/repo_a": "0" * 40})
+
+    reasons, _ = project.get_changed_modules("db")
+
+    assert reasons == {
+        name: "unknown previous commit" for name in MODULES if name != "legacy"
+    }
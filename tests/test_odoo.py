@@ -0,0 +1,173 @@
+import json
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from apixdev.core.catalog import Catalog
+from apixdev.core.common import SingletonMeta
+from apixdev.core.odoo import Odoo
+from apixdev.core.settings import settings, vars
+
+DATABASES = [
+    {
+        "id": index,
+        "name": f"demo{index}",
+        "uuid": f"uuid-{index}",
+        "major_version": "16.0",
+        "manifest_url": f"https://apix.example.com/{index}/manifest.yaml",
+        "repositories_url": f"https://apix.example.com/{index}/repositories.yaml",
+        "compose_url": f"https://apix.example.com/{index}/docker-compose.yaml",
+        "write_date": "2024-01-01 00:00:00",
+    }
+    for index in range(1, 6)
+]
+
+
+def filter_records(domain):
+    records = DATABASES
+    for field, operator, value in domain:
+        if operator == "=":
+            records = [record for record in records if record[field] == value]
+    return records
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Odoo JSON-RPC stand-in serving DATABASES as saas.database records."""
+
+    protocol_version = "HTTP/1.1"
+    calls = []
+
+    def log_message(self, *args):  # pylint: disable=W0221
+        pass
+
+    def dispatch(self, params):
+        if params.get("method") == "login":
+            return 2
+        model, method, *args = params["args"][3:]
+        args, kwargs = (args + [[], {}])[:2]
+
+        if method == "context_get":
+            return {"lang": "en_US", "tz": "UTC"}
+        if method == "search":
+            return [record["id"] for record in filter_records(args[0])]
+        if method == "search_read":
+            records = filter_records(args[0])
+            offset = kwargs.get("offset", 0)
+            limit = kwargs.get("limit") or len(records)
+            fields = kwargs["fields"] + ["id"]
+            return [
+                {key: val for key, val in record.items() if key in fields}
+                for record in records[offset : offset + limit]
+            ]
+        if method == "action_get_last_backup":
+            return {"url": f"https://apix.example.com/{args[0][0]}/backup.zip"}
+        raise ValueError(f"Unexpected call {model}.{method}")
+
+    def do_POST(self):  # pylint: disable=C0103
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.calls.append(self.path)
+
+        if self.path == "/web/webclient/version_info":
+            result = {"server_version": "16.0", "server_version_info": [16, 0]}
+        else:
+            result = self.dispatch(body["params"])
+
+        content = json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": result})
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content.encode("utf8"))
+
+
+def round_trips():
+    """Return number of HTTP requests since last call."""
+
+    count = len(Handler.calls)
+    Handler.calls = []
+    return count
+
+
+def new_odoo():
+    SingletonMeta._instances.pop(Odoo, None)  # pylint: disable=W0212
+    return Odoo.new()
+
+
+@pytest.fixture
+def odoo(http_server):
+    url = http_server(Handler)
+    settings.set_vars(
+        {
+            "apix.url": "127.0.0.1",
+            "apix.port": url.rsplit(":", 1)[1],
+            "apix.protocol": "jsonrpc",
+        }
+    )
+    Odoo.logout()
+    Handler.calls = []
+
+    yield new_odoo()
+
+    SingletonMeta._instances.pop(Odoo, None)  # pylint: disable=W0212
+    Odoo.logout()
+
+
+def test_session_reused(odoo):
+    assert odoo._cr is not None  # pylint: disable=W0212
+    # Version probe, login and user context
+    assert round_trips() == 3
+
+    new_odoo()
+    assert round_trips() == 0
+
+
+def test_get_databases_single_round_trip(odoo):
+    round_trips()
+
+    records = odoo.get_databases("demo2", limit=1)
+
+    assert round_trips() == 1
+    assert records == [{key: DATABASES[1][key] for key in ["id", *vars.CATALOG_FIELDS]}]
+
+
+def test_get_database_by_uuid_single_round_trip(odoo):
+    round_trips()
+
+    record = odoo.get_database_by_uuid("uuid-3")
+
+    assert round_trips() == 1
+    assert record["manifest_url"] == DATABASES[2]["manifest_url"]
+    assert record["compose_url"] == DATABASES[2]["compose_url"]
+    assert odoo.get_database_by_uuid("unknown") is False
+
+
+def test_get_last_backup_url(odoo):
+    round_trips()
+
+    url = odoo.get_last_backup_url("uuid-4")
+
+    assert round_trips() == 2
+    assert url == "https://apix.example.com/4/backup.zip"
+
+
+def test_search_read_all_pages(odoo):
+    round_trips()
+
+    records = odoo.search_read_all("saas.database", [], ["name"], page_size=2)
+
+    assert round_trips() == 3
+    assert [record["name"] for record in records] == [
+        record["name"] for record in DATABASES
+    ]
+
+
+def test_catalog_sync(odoo, tmp_path):
+    catalog = Catalog(str(tmp_path / "catalog.sqlite"))
+    round_trips()
+
+    assert catalog.sync(odoo) == len(DATABASES)
+    assert round_trips() == 1
+    assert catalog.get("demo1")["manifest_url"] == DATABASES[0]["manifest_url"]
+
+    catalog.sync(odoo, prune=True)
+    assert round_trips() == 2
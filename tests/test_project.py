@@ -0,0 +1,91 @@
+import os
+import subprocess
+
+import pytest
+
+from apixdev.core.settings import settings
+
+FAKE_GITAGGREGATE = """#!/bin/sh
+mkdir -p "$7/.git"
+echo "aggregated $7"
+"""
+
+
+@pytest.fixture
+def remote(tmp_path):
+    """Local git repository with one commit on main, return its path."""
+
+    path = tmp_path / "remote"
+    path.mkdir()
+    for args in [
+        ["init", "-q", "-b", "main"],
+        ["-c", "user.name=test", "-c", "user.email=test@example.com"]
+        + ["commit", "-q", "--allow-empty", "-m", "init"],
+    ]:
+        subprocess.run(["git", *args], cwd=path, check=True)
+
+    return str(path)
+
+
+@pytest.fixture
+def fake_gitaggregate(tmp_path, monkeypatch):
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    script = bin_path / "gitaggregate"
+    script.write_text(FAKE_GITAGGREGATE, encoding="utf8")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_failed_repository_does_not_abort_pull(project, remote, fake_gitaggregate):
+    config = "".join(
+        f"./repositories/{name}:\n"
+        f"  remotes:\n    origin: {remote}\n"
+        f"  merges:\n    - origin main\n"
+        f"  target: origin main\n"
+        for name in ["good", "broken"]
+    )
+    with open(project.repositories_file, "w", encoding="utf8") as file:
+        file.write(config)
+
+    # Not a directory, listing it raises in the worker
+    with open(os.path.join(project.repositories_path, "broken"), "w") as file:
+        file.write("")
+
+    results = project.pull_repositories(jobs=2)
+
+    assert [res["name"] for res in results] == ["good", "broken"]
+    assert results[0]["success"]
+    assert not results[1]["success"]
+    assert "Not a directory" in results[1]["output"]
+    assert list(project.read_state("repositories")) == ["repositories/good"]
+
+
+def test_shallow_repositories_not_cached(
+    project, remote, fake_gitaggregate, monkeypatch
+):
+    monkeypatch.setitem(settings._config["local"], "git_cache", "True")
+    config = (
+        f"./repositories/full:\n"
+        f"  remotes:\n    origin: {remote}\n"
+        f"  merges:\n    - origin main\n"
+        f"  target: origin main\n"
+        f"./repositories/shallow:\n"
+        f"  defaults:\n    depth: 1\n"
+        f"  remotes:\n    origin: {remote}\n"
+        f"  merges:\n    - origin main\n"
+        f"  target: origin main\n"
+    )
+    with open(project.repositories_file, "w", encoding="utf8") as file:
+        file.write(config)
+
+    results = project.pull_repositories(jobs=2)
+
+    assert all(res["success"] for res in results)
+
+    def alternates(name):
+        path = os.path.join(project.repositories_path, name)
+        return os.path.join(path, ".git", "objects", "info", "alternates")
+
+    assert os.path.exists(alternates("full"))
+    assert not os.path.exists(alternates("shallow"))
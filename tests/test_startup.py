@@ -0,0 +1,63 @@
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from apixdev.cli.main import cli
+from apixdev.core.settings import Settings, settings
+
+HEAVY_MODULES = ["pandas", "odoorpc", "requests"]
+
+# Print imported modules once click is done with the command line
+CODE = """
+import json, sys
+from apixdev.cli.main import cli
+try:
+    cli()
+except SystemExit:
+    pass
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--help"],
+        ["project", "--help"],
+        ["project", "locate", "--help"],
+    ],
+)
+def test_help_does_not_import_heavy_modules(run_apix, args):
+    res = run_apix(*args, code=CODE)
+
+    assert res.returncode == 0, res.stderr
+    modules = json.loads(res.stdout.splitlines()[-1])
+    assert "apixdev.cli.main" in modules
+    assert not [name for name in HEAVY_MODULES if name in modules]
+
+
+@pytest.fixture
+def unconfigured(monkeypatch):
+    """Settings reported incomplete, return the list of configuration prompts."""
+    prompts = []
+    monkeypatch.setattr(Settings, "is_ready", property(lambda self: False))
+    monkeypatch.setattr(settings, "set_config", lambda: prompts.append(True))
+    return prompts
+
+
+@pytest.mark.parametrize(
+    "args, prompted",
+    [
+        (["--help"], False),
+        (["project", "--help"], False),
+        (["project", "locate", "--help"], False),
+        # Missing command is a usage error, nothing runs
+        (["project"], False),
+        (["project", "locate", "missing"], True),
+    ],
+)
+def test_configuration_asked_only_when_a_command_runs(unconfigured, args, prompted):
+    CliRunner().invoke(cli, args)
+
+    assert unconfigured == ([True] if prompted else [])
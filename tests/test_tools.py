@@ -0,0 +1,77 @@
+import pytest
+from packaging.specifiers import SpecifierSet
+
+from apixdev.core.exceptions import RequirementsConflict
+from apixdev.core.tools import filter_requirements, is_empty_specifier
+
+
+@pytest.mark.parametrize(
+    "specifier, empty",
+    [
+        ("", False),
+        (">=1,<2", False),
+        ("==1.2.0,>=2", True),
+        ("==1,==2", True),
+        ("==1,==1.0", False),
+        # Inclusive and exclusive bounds on the same version
+        (">=1,<=1", False),
+        (">1,<=1", True),
+        (">=1,<1", True),
+        (">1,<1", True),
+        (">=2,>1,<=2", False),
+        (">2,>=2,<=2", True),
+        # Exclusions only matter when a single version is left
+        ("==1,!=1", True),
+        (">=1,<=1,!=1", True),
+        (">=1,<2,!=1.5", False),
+        # ~=1.4.5 is >=1.4.5,==1.4.*
+        ("~=1.4.5,>=1.5", True),
+        ("~=1.4.5,<1.4.5", True),
+        ("~=1.4.5,<=1.4.9", False),
+        ("~=1.4,<1.9", False),
+        ("~=1.4,>=2", True),
+        # ==1.4.* is >=1.4.dev0,<1.5.dev0
+        ("==1.4.*,>=1.4.9", False),
+        ("==1.4.*,>=1.5", True),
+        ("==1.*,<1", False),
+        ("==1.*,<1.0.dev0", True),
+        ("==1.*,==2.*", True),
+        # Not bounds
+        ("!=1.*,>=1", False),
+        ("===foo", False),
+    ],
+)
+def test_is_empty_specifier(specifier, empty):
+    assert is_empty_specifier(SpecifierSet(specifier)) is empty
+
+
+@pytest.mark.parametrize(
+    "python_version, expected",
+    [
+        ("3.7", ["xlrd==1.2.0"]),
+        ("3.10", ["xlrd>=2"]),
+        ("3.10.12", ["xlrd>=2"]),
+    ],
+)
+def test_filter_requirements_markers(python_version, expected):
+    items = [
+        'xlrd==1.2.0; python_version<"3.8"',
+        'xlrd>=2; python_version>="3.8"',
+    ]
+    assert filter_requirements(items, python_version) == expected
+
+
+def test_filter_requirements_platform_markers():
+    items = ['pywin32; sys_platform=="win32"', 'uvloop; sys_platform=="linux"']
+    assert filter_requirements(items) == ["uvloop"]
+
+
+def test_filter_requirements_merge():
+    items = ["Xlrd>=1", "xlrd<2", "xlrd>=1", "requests"]
+    assert filter_requirements(items) == ["requests", "xlrd<2,>=1"]
+
+
+def test_filter_requirements_conflict():
+    with pytest.raises(RequirementsConflict) as info:
+        filter_requirements(["xlrd==1.2.0", "xlrd>=2", "requests"])
+    assert list(info.value.conflicts) == ["xlrd"]